@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Course, Session, User, NewsItem, NewsBulletin, Event, BuildingDay
+from .models import Course, Session, User, NewsItem, NewsBulletin, Event, BuildingDay, SessionWaitlistEntry, \
+    SessionRecurrence, SessionRecurrenceException, OutgoingEmail, SessionChangeNotice
 
 
 class CourseAdmin(admin.ModelAdmin):
@@ -10,6 +11,11 @@ class UserAdmin(admin.ModelAdmin):
     list_display = ('first_name', 'last_name', 'birthdate', 'email', 'teacher', 'date_joined')
 
 
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to', 'created', 'sent', 'attempts')
+    list_filter = ('sent',)
+
+
 admin.site.register(Course, CourseAdmin)
 admin.site.register(Session)
 admin.site.register(User, UserAdmin)
@@ -17,3 +23,8 @@ admin.site.register(NewsItem)
 admin.site.register(NewsBulletin)
 admin.site.register(Event)
 admin.site.register(BuildingDay)
+admin.site.register(SessionWaitlistEntry)
+admin.site.register(SessionRecurrence)
+admin.site.register(SessionRecurrenceException)
+admin.site.register(OutgoingEmail, OutgoingEmailAdmin)
+admin.site.register(SessionChangeNotice)
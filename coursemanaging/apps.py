@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class CoursemanagingConfig(AppConfig):
     name = 'coursemanaging'
+
+    def ready(self):
+        from coursemanaging import signals  # noqa: F401
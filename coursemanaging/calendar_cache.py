@@ -0,0 +1,108 @@
+import re
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from coursemanaging.calendar_data import CalendarWindow, load_calendar_entries
+from coursemanaging.open_calendar import OpenCalendar
+
+CALENDAR_VERSION_KEY = 'calendar:version'
+CALENDAR_MODIFIED_KEY = 'calendar:modified'
+SESSION_CLASS_MARKER = re.compile(r'%%session:(\d+):(\d+)%%')
+
+
+class PlaceholderMembership(object):
+    """
+    Renders a marker instead of the session class, so the markup can be shared between users and the classes
+    filled in afterwards by apply_membership.
+    """
+
+    def session_class(self, session_id, course_id):
+        return '%%%%session:%d:%d%%%%' % (session_id or 0, course_id)
+
+
+def get_calendar_version():
+    """
+    The version is initialised with a timestamp so a version lost by the cache never reuses an old number.
+    """
+    cache.add(CALENDAR_VERSION_KEY, int(time.time() * 1000), None)
+    return cache.get(CALENDAR_VERSION_KEY)
+
+
+def get_calendar_last_modified():
+    """
+    The moment of the last calendar change, assumed to be now when the cache lost track of it.
+    """
+    cache.add(CALENDAR_MODIFIED_KEY, timezone.now().replace(microsecond=0), None)
+    return cache.get(CALENDAR_MODIFIED_KEY)
+
+
+def bump_calendar_version():
+    try:
+        cache.incr(CALENDAR_VERSION_KEY)
+    except ValueError:
+        get_calendar_version()
+    cache.set(CALENDAR_MODIFIED_KEY, timezone.now().replace(microsecond=0), None)
+
+
+def get_user_schedule_version(user_id):
+    """
+    Version of the sessions and courses a user is linked to, bumped when the user subscribes, leaves or teaches.
+    """
+    key = 'calendar:user:%d' % user_id
+    cache.add(key, int(time.time() * 1000), None)
+    return cache.get(key)
+
+
+def bump_user_schedule_versions(user_ids):
+    for user_id in user_ids:
+        try:
+            cache.incr('calendar:user:%d' % user_id)
+        except ValueError:
+            get_user_schedule_version(user_id)
+
+
+def apply_membership(html, membership):
+    return SESSION_CLASS_MARKER.sub(
+        lambda match: membership.session_class(int(match.group(1)), int(match.group(2))), html)
+
+
+def get_calendar_html(membership, month=None, week=None):
+    """
+    Return the month calendar of the (year, month) tuple month and the week calendar containing the date week,
+    for the user. The markup missing from the cache is rendered from a single load covering all missing windows.
+    """
+    today = date.today().isoformat()
+    version = get_calendar_version()
+    windows, keys = {}, {}
+    if month is not None:
+        windows['month'] = CalendarWindow.for_month(*month)
+        keys['month'] = 'calendar:month:%s:%s:%d:%d' % (version, today, month[0], month[1])
+    if week is not None:
+        windows['week'] = CalendarWindow.for_week(week)
+        keys['week'] = 'calendar:week:%s:%s:%s' % (version, today, windows['week'].start.date().isoformat())
+
+    cached = cache.get_many(list(keys.values()))
+    html = {name: cached.get(key) for name, key in keys.items()}
+    missing = [name for name in keys if html[name] is None]
+    if missing:
+        entries = load_calendar_entries(*[windows[name] for name in missing])
+        for name in missing:
+            window_entries = entries.within(windows[name])
+            calendar = OpenCalendar(window_entries.sessions, window_entries.events, window_entries.building_days,
+                                    PlaceholderMembership())
+            if name == 'month':
+                html[name] = calendar.formatmonth(*month)
+            else:
+                html[name] = calendar.bootstrap_week(week.year, week.month, week.day)
+        cache.set_many({keys[name]: html[name] for name in missing}, _get_timeout())
+
+    html = {name: apply_membership(markup, membership) for name, markup in html.items()}
+    return html.get('month'), html.get('week')
+
+
+def _get_timeout():
+    return getattr(settings, 'CALENDAR_CACHE_TIMEOUT', 60 * 60 * 24)
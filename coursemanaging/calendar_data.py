@@ -0,0 +1,171 @@
+import datetime
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Case, When, F
+from django.urls import reverse
+from django.utils import timezone
+
+from coursemanaging.models import Session, SessionRecurrence, SessionRecurrenceException, Event, BuildingDay
+
+
+class CalendarWindow(object):
+    """
+    A half open range [start, end) of aware datetimes shown by one calendar view.
+    """
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def for_month(cls, year, month):
+        start = datetime.datetime(year, month, 1)
+        end = datetime.datetime(year + month // 12, month % 12 + 1, 1)
+        return cls(timezone.make_aware(start), timezone.make_aware(end))
+
+    @classmethod
+    def for_dates(cls, first_day, last_day):
+        """
+        The days from first_day up to and including last_day.
+        """
+        start = datetime.datetime(first_day.year, first_day.month, first_day.day)
+        end = datetime.datetime(last_day.year, last_day.month, last_day.day) + timedelta(days=1)
+        return cls(timezone.make_aware(start), timezone.make_aware(end))
+
+    @classmethod
+    def for_week(cls, day):
+        """
+        The week from monday to sunday containing the given date.
+        """
+        monday = day - timedelta(days=day.weekday())
+        start = datetime.datetime(monday.year, monday.month, monday.day)
+        return cls(timezone.make_aware(start), timezone.make_aware(start + timedelta(days=7)))
+
+    def __contains__(self, moment):
+        return self.start <= moment < self.end
+
+
+class CalendarEntry(object):
+    """
+    Compact projection of a session, event or building day holding only what the calendar renders, with the local
+    start and end computed once.
+    """
+    __slots__ = ('id', 'course_id', 'start', 'end', 'url', 'title', 'location')
+
+    def __init__(self, id, start, duration, url, title, course_id=None, location=None):
+        self.id = id
+        self.course_id = course_id
+        self.start = timezone.localtime(start)
+        self.end = timezone.localtime(start + duration)
+        self.url = url
+        self.title = title
+        self.location = location
+
+    def as_dict(self):
+        result = {'id': self.id, 'start': self.start.isoformat(), 'end': self.end.isoformat(), 'url': self.url,
+                  'title': self.title}
+        if self.course_id is not None:
+            result['course_id'] = self.course_id
+            result['location'] = self.location
+        return result
+
+
+class CalendarEntries(object):
+    """
+    The sessions, events and building days loaded for one or more calendar windows.
+    """
+
+    def __init__(self, sessions, events, building_days):
+        self.sessions = sessions
+        self.events = events
+        self.building_days = building_days
+
+    def as_dict(self):
+        return {'sessions': [session.as_dict() for session in self.sessions],
+                'events': [event.as_dict() for event in self.events],
+                'building_days': [building_day.as_dict() for building_day in self.building_days]}
+
+    def within(self, window):
+        """
+        Return the entries starting inside the window, split off in memory.
+        """
+        return CalendarEntries([session for session in self.sessions if session.start in window],
+                               [event for event in self.events if event.start in window],
+                               [building_day for building_day in self.building_days if building_day.start in window])
+
+
+def load_calendar_entries(*windows):
+    """
+    Load the entries of all windows with a single query per entry type, covering the union of the windows.
+    """
+    start = min(window.start for window in windows)
+    end = max(window.end for window in windows)
+    sessions = _session_entries(Session.objects.filter(start__gte=start, start__lt=end, course__is_active=True))
+    sessions.extend(_occurrence_entries(start, end))
+    return CalendarEntries(
+        sessions,
+        _event_entries(Event.objects.filter(start__gte=start, start__lt=end)),
+        _building_day_entries(BuildingDay.objects.filter(start__gte=start, start__lt=end)),
+    )
+
+
+def _session_entries(sessions):
+    """
+    The calendar shows the location of the course when a session with its own location leaves the name empty.
+    """
+    course_urls = {}
+    entries = []
+    sessions = sessions.annotate(calendar_location=Case(
+        When(location_diff_course=True, location_short__gt='', then=F('location_short')),
+        default=F('course__location_short')))
+    for row in sessions.values('id', 'start', 'duration', 'course_id', 'course__course_name', 'calendar_location'):
+        if row['course_id'] not in course_urls:
+            course_urls[row['course_id']] = reverse('coursemanaging:course-detail', args=[row['course_id']])
+        entries.append(CalendarEntry(row['id'], row['start'], row['duration'], course_urls[row['course_id']],
+                                     row['course__course_name'], course_id=row['course_id'],
+                                     location=row['calendar_location']))
+    return entries
+
+
+def _occurrence_entries(start, end):
+    """
+    The occurrences of the recurrences that are not materialized as a session yet, these entries have no id.
+    """
+    recurrences = list(SessionRecurrence.objects.filter(start__lt=end, until__gte=start, course__is_active=True)
+                       .select_related('course'))
+    if not recurrences:
+        return []
+    excluded = defaultdict(set)
+    for recurrence_id, occurrence_start in SessionRecurrenceException.objects.filter(
+            recurrence__in=recurrences, occurrence_start__gte=start, occurrence_start__lt=end) \
+            .values_list('recurrence_id', 'occurrence_start'):
+        excluded[recurrence_id].add(occurrence_start)
+    for recurrence_id, occurrence_start in Session.objects.filter(
+            recurrence__in=recurrences, occurrence_start__gte=start, occurrence_start__lt=end) \
+            .values_list('recurrence_id', 'occurrence_start'):
+        excluded[recurrence_id].add(occurrence_start)
+    entries = []
+    for recurrence in recurrences:
+        course = recurrence.course
+        url = reverse('coursemanaging:course-detail', args=[course.id])
+        if recurrence.location_diff_course and recurrence.location_short:
+            location = recurrence.location_short
+        else:
+            location = course.location_short
+        for occurrence_start in recurrence.occurrence_starts(start, end, excluded[recurrence.id]):
+            entries.append(CalendarEntry(None, occurrence_start, recurrence.duration, url, course.course_name,
+                                         course_id=course.id, location=location))
+    return entries
+
+
+def _event_entries(events):
+    return [CalendarEntry(row['id'], row['start'], row['duration'],
+                          reverse('coursemanaging:event-detail', args=[row['id']]), row['event_name'])
+            for row in events.values('id', 'start', 'duration', 'event_name')]
+
+
+def _building_day_entries(building_days):
+    return [CalendarEntry(row['id'], row['start'], row['duration'],
+                          reverse('coursemanaging:building-day-detail', args=[row['id']]), 'bouwdag')
+            for row in building_days.values('id', 'start', 'duration')]
@@ -13,7 +13,7 @@ from django.utils.http import urlsafe_base64_encode
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Div, ButtonHolder, Submit
 
-from coursemanaging.models import User, Course, Session, Event, BuildingDay
+from coursemanaging.models import User, Course, Session, Event, BuildingDay, SessionRecurrence
 from coursemanaging.tokens import account_activation_token
 
 Tab.link_template = 'coursemanaging/%s/tab-link.html'
@@ -130,22 +130,38 @@ class SessionCreateForm(forms.ModelForm):
             )
 
     def save(self, commit=True):
-        session = super(SessionCreateForm, self).save()
+        """
+        Multiple sessions are stored as a weekly recurrence, the sessions are only created when they are needed.
+        """
+        session = super(SessionCreateForm, self).save(commit=False)
         session.start = timezone.localtime(session.start)
         session.course = self.course
         if commit:
             if self.cleaned_data['multiple_sessions']:
-                start = session.start
-                while start <= self.cleaned_data['weekly_until']:
-                    session.start = start
-                    session.save()
-                    session.id = None
-                    start += timedelta(days=7)
+                recurrence = SessionRecurrence(course=self.course, start=session.start,
+                                               until=self.cleaned_data['weekly_until'], interval_weeks=1,
+                                               **{field: getattr(session, field)
+                                                  for field in SessionRecurrence.SESSION_FIELDS})
+                recurrence.save()
+                return recurrence.build_session(recurrence.start)
             else:
                 session.save()
         return session
 
 
+class ScheduleImportForm(forms.Form):
+    schedule = forms.FileField(label='Lessenrooster (CSV of ICS)')
+    dry_run = forms.BooleanField(label='Enkel controleren', required=False)
+
+    def clean_schedule(self):
+        schedule = self.cleaned_data['schedule']
+        try:
+            self.cleaned_data['schedule_text'] = schedule.read().decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise ValidationError('Het bestand moet UTF-8 gecodeerd zijn')
+        return schedule
+
+
 class EventCreateForm(forms.ModelForm):
     class Meta:
         model = Event
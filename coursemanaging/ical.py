@@ -0,0 +1,140 @@
+from datetime import datetime
+
+import pytz
+from django.utils import timezone
+
+CRLF = '\r\n'
+
+
+def escape_text(value):
+    """
+    Escape a TEXT value as described in RFC 5545 section 3.3.11.
+    """
+    return value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\r\n', '\\n') \
+        .replace('\n', '\\n')
+
+
+def fold_line(line):
+    """
+    Split a content line in lines of at most 75 octets, continuation lines start with a space.
+    """
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + CRLF
+    parts = []
+    while encoded:
+        size = 75 if not parts else 74
+        # never split in the middle of a multi byte character
+        while size < len(encoded) and (encoded[size] & 0xC0) == 0x80:
+            size -= 1
+        parts.append(encoded[:size].decode('utf-8'))
+        encoded = encoded[size:]
+    return (CRLF + ' ').join(parts) + CRLF
+
+
+def format_datetime(value):
+    return timezone.localtime(value, timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def format_event(uid, start, end, summary, location=None, url=None, description=None):
+    """
+    Return a VEVENT component as a string of folded content lines.
+    """
+    lines = ['BEGIN:VEVENT',
+             'UID:' + uid,
+             'DTSTAMP:' + format_datetime(timezone.now()),
+             'DTSTART:' + format_datetime(start),
+             'DTEND:' + format_datetime(end),
+             'SUMMARY:' + escape_text(summary)]
+    if location:
+        lines.append('LOCATION:' + escape_text(location))
+    if url:
+        lines.append('URL:' + url)
+    if description:
+        lines.append('DESCRIPTION:' + escape_text(description))
+    lines.append('END:VEVENT')
+    return ''.join(fold_line(line) for line in lines)
+
+
+def iter_calendar(name, events):
+    """
+    Yield a VCALENDAR in chunks, events is an iterable of VEVENT strings that is only consumed while streaming.
+    """
+    yield ''.join(fold_line(line) for line in ['BEGIN:VCALENDAR',
+                                               'VERSION:2.0',
+                                               'PRODID:-//Open Gym//opengym//NL',
+                                               'CALSCALE:GREGORIAN',
+                                               'X-WR-CALNAME:' + escape_text(name)])
+    for event in events:
+        yield event
+    yield fold_line('END:VCALENDAR')
+
+
+def unescape_text(value):
+    """
+    Reverse escape_text.
+    """
+    result = []
+    characters = iter(value)
+    for character in characters:
+        if character == '\\':
+            character = next(characters, '')
+            result.append('\n' if character in 'nN' else character)
+        else:
+            result.append(character)
+    return ''.join(result)
+
+
+def unfold_lines(text):
+    """
+    Yield (line number, content line) with the continuation lines joined, the number is the first physical line.
+    """
+    line_number, current = 0, None
+    for number, line in enumerate(text.splitlines(), 1):
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current:
+            yield line_number, current
+        line_number, current = number, line
+    if current:
+        yield line_number, current
+
+
+def parse_content_line(line):
+    """
+    Split a content line in its name, parameters and value.
+    """
+    head, _, value = line.partition(':')
+    name, *params = head.split(';')
+    return name.upper(), dict(param.partition('=')[::2] for param in params), value
+
+
+def parse_datetime(value, params):
+    """
+    Return an aware datetime of a DATE-TIME value in UTC, with a TZID parameter or floating in the local time zone.
+    Raises a ValueError for an unknown time zone and for a local time skipped or repeated by a DST change.
+    """
+    moment = datetime.strptime(value.rstrip('Z'), '%Y%m%dT%H%M%S')
+    if value.endswith('Z'):
+        return moment.replace(tzinfo=timezone.utc)
+    try:
+        return timezone.make_aware(moment, pytz.timezone(params['TZID']) if 'TZID' in params else None)
+    except (pytz.UnknownTimeZoneError, pytz.InvalidTimeError) as error:
+        raise ValueError('Invalid date-time %s: %r' % (value, error))
+
+
+def iter_events(text):
+    """
+    Yield (line number, properties) for every VEVENT, properties maps a name to a (parameters, value) tuple.
+    """
+    properties = None
+    for line_number, line in unfold_lines(text):
+        name, params, value = parse_content_line(line)
+        if name == 'BEGIN' and value.upper() == 'VEVENT':
+            properties, event_line_number = {}, line_number
+        elif name == 'END' and value.upper() == 'VEVENT' and properties is not None:
+            yield event_line_number, properties
+            properties = None
+        elif properties is not None:
+            properties[name] = (params, value)
@@ -0,0 +1,56 @@
+import timeit
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from coursemanaging.calendar_data import CalendarEntry
+from coursemanaging.open_calendar import OpenCalendar, CalendarMembership
+
+
+class Command(BaseCommand):
+    help = 'Measures how the month and week render time of the calendar grows with the number of entries. ' \
+           'The entries are built in memory, the database is not touched.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10, 100, 1000, 5000],
+                            help='number of sessions to render, events and building days are added on top')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='number of renders per size, the fastest one is reported')
+
+    def handle(self, *args, **options):
+        today = timezone.localtime(timezone.now())
+        first_day = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        membership = CalendarMembership(teacher_course_ids=[1], student_course_ids=[2],
+                                        subscribed_session_ids=range(0, 10000, 3), is_authenticated=True)
+
+        self.stdout.write('%10s %14s %14s' % ('entries', 'month (ms)', 'week (ms)'))
+        for size in options['sizes']:
+            sessions, events, building_days = self.build_entries(size, first_day)
+
+            def render_month():
+                OpenCalendar(sessions, events, building_days, membership).formatmonth(today.year, today.month)
+
+            def render_week():
+                OpenCalendar(sessions, events, building_days, membership) \
+                    .bootstrap_week(today.year, today.month, today.day)
+
+            month_time = min(timeit.repeat(render_month, number=1, repeat=options['repeat']))
+            week_time = min(timeit.repeat(render_week, number=1, repeat=options['repeat']))
+            self.stdout.write('%10d %14.2f %14.2f' % (size, month_time * 1000, week_time * 1000))
+
+    def build_entries(self, size, first_day):
+        """
+        Spread sessions of five courses over the first 28 days of the month, with an event and a building day for
+        every tenth session.
+        """
+        sessions, events, building_days = [], [], []
+        for i in range(size):
+            start = first_day + timedelta(days=i % 28, hours=8 + i % 12)
+            course_id = 1 + i % 5
+            sessions.append(CalendarEntry(i, start, timedelta(hours=2), '/course/%d/' % course_id,
+                                          'course %d' % course_id, course_id=course_id, location='zaal'))
+            if i % 10 == 0:
+                events.append(CalendarEntry(i, start, timedelta(hours=4), '/event/%d' % i, 'event %d' % i))
+                building_days.append(CalendarEntry(i, start, timedelta(hours=8), '/building-day/%d' % i, 'bouwdag'))
+        return sessions, events, building_days
@@ -0,0 +1,64 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from coursemanaging.models import Course, Session, User
+
+
+class Command(BaseCommand):
+    help = 'Hammers one session with parallel reservations, checks that it is not overbooked and reports the ' \
+           'throughput. Needs a database with row locking, e.g. MySQL or PostgreSQL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help='number of users joining the session')
+        parser.add_argument('--capacity', type=int, default=20, help='maximum number of students of the session')
+        parser.add_argument('--threads', type=int, default=16, help='number of parallel joins')
+        parser.add_argument('--keep', action='store_true', help='keep the benchmark course, session and users')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            raise CommandError('sqlite serializes all writes, run the benchmark against MySQL or PostgreSQL')
+
+        prefix = 'benchmark-%s' % uuid.uuid4().hex[:8]
+        course = Course.objects.create(course_name=prefix, course_level=Course.BEGINNER, description=prefix,
+                                       max_students_session=options['capacity'], is_active=False)
+        session = Session.objects.create(course=course, start=timezone.now() + timedelta(days=365),
+                                         duration=timedelta(hours=2))
+        User.objects.bulk_create([User(email='%s-%d@example.com' % (prefix, i), first_name=prefix, last_name=str(i),
+                                       birthdate=date.today()) for i in range(options['users'])])
+        users = list(User.objects.filter(first_name=prefix))
+
+        def join(user):
+            try:
+                return Session.objects.get(pk=session.pk).reserve(user)
+            finally:
+                connection.close()
+
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+            results = list(executor.map(join, users))
+        elapsed = time.time() - started
+
+        session.refresh_from_db()
+        subscriptions = session.subscribed_users.count()
+        waitlisted = session.waitlist_entries.count()
+        expected = min(options['capacity'], options['users'])
+        self.stdout.write('%d joins in %.2f s, %.1f joins/s' % (len(users), elapsed, len(users) / elapsed))
+        self.stdout.write('subscribed: %d (counter %d), waitlisted: %d, reported subscribed: %d'
+                          % (subscriptions, session.subscriber_count, waitlisted,
+                             results.count(Session.SUBSCRIBED)))
+
+        if not options['keep']:
+            session.delete()
+            course.delete()
+            User.objects.filter(first_name=prefix).delete()
+
+        if subscriptions != expected or session.subscriber_count != expected \
+                or waitlisted != options['users'] - expected:
+            raise CommandError('the session was overbooked or lost reservations')
+        self.stdout.write(self.style.SUCCESS('no overbooking'))
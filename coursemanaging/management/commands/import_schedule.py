@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from coursemanaging.schedule_import import FORMATS, guess_format, import_schedule
+
+
+class Command(BaseCommand):
+    help = 'Imports the sessions of many courses at once from a CSV or ICS file. Nothing is imported when a row ' \
+           'has an error.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help='Default based on the file extension')
+        parser.add_argument('--dry-run', action='store_true', help='Only validate the file')
+
+    def handle(self, *args, **options):
+        with open(options['path'], encoding='utf-8-sig') as schedule_file:
+            text = schedule_file.read()
+        schedule_import = import_schedule(text, options['format'] or guess_format(options['path']),
+                                          dry_run=options['dry_run'])
+        for line, message in schedule_import.errors:
+            self.stderr.write('line %d: %s' % (line, message))
+        if schedule_import.errors:
+            raise CommandError('%d rows with errors, nothing imported' % len(schedule_import.errors))
+        self.stdout.write('%d sessions valid, %d imported' % (len(schedule_import.sessions),
+                                                             schedule_import.created))
@@ -0,0 +1,30 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from coursemanaging.prerender import PAGE_GROUPS, is_enabled, get_page_paths, get_page_file, write_page
+
+
+class Command(BaseCommand):
+    help = 'Renders the public pages as anonymous visitors see them to files in PRERENDER_ROOT, for the reverse ' \
+           'proxy to serve to visitors without a session cookie. Saving the content behind a page removes its ' \
+           'file, run with --missing every minute to render those again and without it every night, since the ' \
+           'calendar on the landing page highlights today.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing', action='store_true', help='Only render the pages without a file')
+        parser.add_argument('--group', action='append', choices=PAGE_GROUPS, help='Only render these pages')
+
+    def handle(self, *args, **options):
+        if not is_enabled():
+            raise CommandError('PRERENDER_ROOT is not set')
+        rendered = 0
+        for group in options['group'] or PAGE_GROUPS:
+            for path in get_page_paths(group):
+                if options['missing'] and os.path.exists(get_page_file(path)):
+                    continue
+                if write_page(path):
+                    rendered += 1
+                else:
+                    self.stderr.write('%s is not a public page' % path)
+        self.stdout.write('rendered %d pages' % rendered)
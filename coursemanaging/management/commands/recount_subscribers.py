@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from coursemanaging.models import Course, Session
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the stored subscriber counts of sessions and courses from the subscriptions, e.g. after ' \
+           'subscriptions were changed through the admin.'
+
+    def handle(self, *args, **options):
+        self.recount(Session, 'subscriber_count', 'subscribed_users', Session.subscribed_users.through, 'session')
+        self.recount(Course, 'student_count', 'students', Course.students.through, 'course')
+
+    def recount(self, model, count_field, relation, through, through_field):
+        """
+        Finds the rows with a wrong count and recomputes them inside the update itself, so subscriptions made
+        meanwhile are not lost.
+        """
+        wrong_ids = list(model.objects.annotate(actual_count=Count(relation))
+                         .exclude(**{count_field: F('actual_count')})
+                         .values_list('pk', flat=True))
+        actual_count = through.objects.filter(**{through_field: OuterRef('pk')}).values(through_field) \
+            .annotate(count=Count('pk')).values('count')
+        model.objects.filter(pk__in=wrong_ids).update(**{count_field: Coalesce(Subquery(actual_count), 0)})
+        self.stdout.write('%s: repaired %d %s' % (model._meta.verbose_name_plural, len(wrong_ids), count_field))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from coursemanaging.models import Session, SessionRecurrence, render_markdown
+
+
+class Command(BaseCommand):
+    help = 'Stores the rendered markdown of the extra info of sessions and recurrences that have none yet, or of ' \
+           'all of them with --all, e.g. after the markdown extensions changed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Render every row again')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        for model in (Session, SessionRecurrence):
+            rows = model.objects.all()
+            if not options['all']:
+                rows = rows.filter(extra_info_html__isnull=True)
+            self.render(model, rows.values_list('pk', 'extra_info').order_by('pk'), options['batch_size'])
+
+    def render(self, model, rows, batch_size):
+        """
+        Updates only the html column, so running this next to the site never overwrites other changes.
+        """
+        count = 0
+        last_pk = 0
+        while True:
+            batch = list(rows.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                for pk, extra_info in batch:
+                    model.objects.filter(pk=pk, extra_info=extra_info) \
+                        .update(extra_info_html=render_markdown(extra_info))
+            count += len(batch)
+            last_pk = batch[-1][0]
+        self.stdout.write('%s: rendered %d' % (model._meta.verbose_name_plural, count))
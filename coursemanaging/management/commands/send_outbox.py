@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from coursemanaging.outbox import deliver_outbox
+
+
+class Command(BaseCommand):
+    help = 'Delivers the mails queued by the OutboxEmailBackend. Run it from cron, or keep it running with --loop. ' \
+           'Several workers can run at the same time, they never send the same mail.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Mails sent over one connection')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds to wait when the outbox is empty')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = deliver_outbox(options['batch_size'])
+            if sent or failed:
+                self.stdout.write('sent %d mails, %d failed' % (sent, failed))
+            if not options['loop']:
+                break
+            if sent + failed < options['batch_size']:
+                time.sleep(options['interval'])
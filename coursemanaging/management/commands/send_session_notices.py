@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from coursemanaging.session_notices import send_session_notices
+
+
+class Command(BaseCommand):
+    help = 'Mails the subscribers of changed and cancelled sessions, one mail per user for all changes. Run it ' \
+           'every few minutes, changes made within SESSION_NOTICE_WINDOW are sent together.'
+
+    def handle(self, *args, **options):
+        self.stdout.write('sent %d mails' % send_session_notices())
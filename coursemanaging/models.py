@@ -1,17 +1,65 @@
-from datetime import date
+import calendar
+from datetime import date, datetime
 from datetime import timedelta
 
 from django.contrib.auth.base_user import BaseUserManager, AbstractBaseUser
 from django.contrib.auth.models import PermissionsMixin
 from django.core.exceptions import ValidationError
 from django.core.mail import send_mail
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, Case, When, Exists, OuterRef, Subquery, Prefetch
 from django.urls import reverse_lazy
 from django.utils import timezone
+from django.utils.crypto import get_random_string
 from django.utils.translation import gettext as _
 from markdown import markdown
 
 
+def new_calendar_feed_key():
+    return get_random_string(32)
+
+
+def render_markdown(text):
+    if not text:
+        return ''
+    return markdown(text)
+
+
+class RenderedExtraInfoMixin(object):
+    """
+    Keeps extra_info_html in sync with the markdown in extra_info. The markdown is only rendered when extra_info
+    changed since the instance was loaded, so pages show the stored html without rendering anything.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(RenderedExtraInfoMixin, cls).from_db(db, field_names, values)
+        instance._loaded_extra_info = instance.__dict__.get('extra_info')
+        return instance
+
+    def update_extra_info_html(self):
+        if 'extra_info' in self.get_deferred_fields():
+            return
+        if self._state.adding or self.extra_info_html is None \
+                or self.extra_info != getattr(self, '_loaded_extra_info', None):
+            self.extra_info_html = render_markdown(self.extra_info)
+            self._loaded_extra_info = self.extra_info
+
+    def extra_info_rendered(self):
+        if self.extra_info_html is None:
+            return render_markdown(self.extra_info)
+        return self.extra_info_html
+
+
+def _fields_excluding(instance, *excluded):
+    """
+    The names of the fields saved by a regular save, leaving out the counters that are only changed with
+    conditional updates so a stale instance never overwrites them.
+    """
+    return [field.name for field in instance._meta.concrete_fields
+            if not field.primary_key and field.name not in excluded]
+
+
 class MyUserManager(BaseUserManager):
     """
     A custom user manager to deal with emails as unique identifiers for auth
@@ -70,6 +118,7 @@ class User(AbstractBaseUser, PermissionsMixin):
         ),
     )
     date_joined = models.DateTimeField(default=timezone.now, verbose_name='date joined', null=True)
+    calendar_feed_key = models.CharField(max_length=32, default=new_calendar_feed_key, editable=False)
 
     USERNAME_FIELD = 'email'
     objects = MyUserManager()
@@ -83,6 +132,13 @@ class User(AbstractBaseUser, PermissionsMixin):
     def get_short_name(self):
         return self.email
 
+    def reset_calendar_feed_key(self):
+        """
+        Invalidates the calendar feed urls handed out before, e.g. when one was shared by accident.
+        """
+        self.calendar_feed_key = new_calendar_feed_key()
+        self.save(update_fields=['calendar_feed_key'])
+
     def email_user(self, subject, message, from_email=None, **kwargs):
         """
         Sends an email to this User.
@@ -90,6 +146,39 @@ class User(AbstractBaseUser, PermissionsMixin):
         send_mail(subject, message, from_email, [self.email], **kwargs)
 
 
+class CourseQuerySet(models.QuerySet):
+    def with_user_status(self, user):
+        """
+        Annotates whether the user teaches or follows each course, as user_is_teacher_annotated and
+        user_is_student_annotated.
+        """
+        return self.annotate(
+            user_is_teacher_annotated=Exists(Course.teachers.through.objects.filter(course_id=OuterRef('pk'),
+                                                                                    user_id=user.id)),
+            user_is_student_annotated=Exists(Course.students.through.objects.filter(course_id=OuterRef('pk'),
+                                                                                    user_id=user.id)))
+
+    def with_next_session(self):
+        """
+        Annotates the next session of each course as next_session_<field> with subqueries, and prefetches the
+        running recurrences, so get_next_session needs no queries of its own.
+        """
+        now = timezone.now()
+        next_sessions = Session.objects.filter(course=OuterRef('pk'), start__gte=now).with_resolved_details() \
+            .order_by('start', 'id')
+        annotations = {}
+        for name, field in (('id', 'id'), ('start', 'start'), ('duration', 'duration'),
+                            ('subscriber_count', 'subscriber_count'), ('location_short', 'resolved_location_short'),
+                            ('max_students', 'resolved_max_students')):
+            annotations['next_session_' + name] = Subquery(next_sessions.values(field)[:1],
+                                                           output_field=Session._meta.get_field(name))
+        recurrences = SessionRecurrence.objects.filter(until__gte=now).prefetch_related(
+            Prefetch('exceptions', queryset=SessionRecurrenceException.objects.filter(occurrence_start__gte=now)),
+            Prefetch('sessions', queryset=Session.objects.filter(occurrence_start__gte=now)
+                     .only('id', 'recurrence', 'occurrence_start')))
+        return self.annotate(**annotations).prefetch_related(Prefetch('recurrences', queryset=recurrences))
+
+
 class Course(models.Model):
     BEGINNER = 1
     INTERMEDIATE = 2
@@ -111,26 +200,65 @@ class Course(models.Model):
     location_number = models.CharField(max_length=5, null=True, blank=True)
     location_city = models.CharField(max_length=50, null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    student_count = models.PositiveIntegerField(default=0, editable=False)
 
     teachers = models.ManyToManyField(User, related_name='courses_teacher', blank=True)
     students = models.ManyToManyField(User, related_name='courses_student', blank=True)
 
+    objects = CourseQuerySet.as_manager()
+
     def __str__(self):
         return self.course_name
 
     def is_full(self):
         if self.max_students_course:
-            return self.max_students_course <= self.students.count()
+            return self.max_students_course <= self.student_count
         return False
 
     def get_next_session(self):
-        if Session.objects.filter(course=self, start__gte=timezone.now()).exists():
-            return Session.objects.filter(course=self, start__gte=timezone.now()).order_by('start')[0]
+        if hasattr(self, 'next_session_start'):
+            return self.get_annotated_next_session()
+        future_sessions = self.get_future_sessions()
+        if future_sessions:
+            return future_sessions[0]
         else:
             return None
 
+    def get_annotated_next_session(self):
+        """
+        The next session of a course loaded with CourseQuerySet.with_next_session, as an unsaved session holding the
+        annotated values or as the next occurrence of a recurrence, whichever comes first.
+        """
+        candidates = []
+        if self.next_session_start is not None:
+            session = Session(id=self.next_session_id, course=self, start=self.next_session_start,
+                              duration=self.next_session_duration, subscriber_count=self.next_session_subscriber_count)
+            session.resolved_location_short = self.next_session_location_short
+            session.resolved_max_students = self.next_session_max_students
+            candidates.append(session)
+        now = timezone.now()
+        for recurrence in self.recurrences.all():
+            excluded = {exception.occurrence_start for exception in recurrence.exceptions.all()}
+            excluded.update(session.occurrence_start for session in recurrence.sessions.all())
+            for occurrence_start in recurrence.occurrence_starts(now, recurrence.until + timedelta(seconds=1),
+                                                                 excluded):
+                candidates.append(recurrence.build_session(occurrence_start))
+                break
+        if not candidates:
+            return None
+        return min(candidates, key=lambda candidate: candidate.start)
+
     def get_future_sessions(self):
-        return Session.objects.filter(start__gte=timezone.now(), course=self).order_by('start')
+        """
+        The future sessions ordered by start, including the not yet materialized occurrences of the recurrences,
+        which are returned as unsaved sessions.
+        """
+        now = timezone.now()
+        sessions = list(Session.objects.filter(start__gte=now, course=self).with_resolved_details().order_by('start'))
+        for recurrence in self.recurrences.filter(until__gte=now):
+            sessions.extend(recurrence.build_sessions(now, recurrence.until + timedelta(seconds=1)))
+        sessions.sort(key=lambda session: session.start)
+        return sessions
 
     def user_is_subscribed(self, user):
         return self.students.filter(id=user.id).exists()
@@ -139,23 +267,39 @@ class Course(models.Model):
         return self.teachers.filter(id=user.id).exists()
 
     def subscribe_user(self, user):
-        if self.max_students_course and self.students.count() >= self.max_students_course:
-            raise ValidationError(
-                "This course is full",
-                code='full',
-            )
-        self.students.add(user)
+        """
+        Takes a place with a conditional update of student_count, so the course can not be overbooked by
+        concurrent subscriptions. The course row is locked before the membership check, so a user joining twice at
+        the same time is only counted once.
+        """
+        with transaction.atomic():
+            Course.objects.select_for_update().get(pk=self.pk)
+            if self.students.filter(id=user.id).exists():
+                return
+            courses = Course.objects.filter(pk=self.pk)
+            if self.max_students_course:
+                courses = courses.filter(student_count__lt=self.max_students_course)
+            if not courses.update(student_count=F('student_count') + 1):
+                raise ValidationError(
+                    "This course is full",
+                    code='full',
+                )
+            self.students.add(user)
+        self.refresh_from_db(fields=['student_count'])
 
     def unsubscribe_user(self, user):
-        if user not in self.students.all():
-            raise ValidationError(
-                "User not in session ",
-                code='not found',
-            )
-        self.students.remove(user)
+        with transaction.atomic():
+            if not self.students.filter(id=user.id).exists():
+                raise ValidationError(
+                    "User not in session ",
+                    code='not found',
+                )
+            self.students.remove(user)
+            Course.objects.filter(pk=self.pk, student_count__gt=0).update(student_count=F('student_count') - 1)
+        self.refresh_from_db(fields=['student_count'])
 
     def clean(self):
-        if self.max_students_course and self.students.count() > self.max_students_course:
+        if self.max_students_course and self.student_count > self.max_students_course:
             raise ValidationError(
                 "This course has more students than possible",
                 code='full',
@@ -163,6 +307,8 @@ class Course(models.Model):
 
     def save(self, *args, **kwargs):
         self.full_clean()
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = _fields_excluding(self, 'student_count')
         super(Course, self).save(*args, **kwargs)
 
     def get_absolute_url(self):
@@ -217,10 +363,31 @@ class BuildingDay(models.Model):
         return 'bouwdag op ' + str(self.start)
 
 
-class Session(models.Model):
+class SessionQuerySet(models.QuerySet):
+    RESOLVED_FIELDS = (('location_short', 'location_diff_course', 'location_short'),
+                       ('location_street', 'location_diff_course', 'location_street'),
+                       ('location_number', 'location_diff_course', 'location_number'),
+                       ('location_city', 'location_diff_course', 'location_city'),
+                       ('max_students', 'max_students_diff_course', 'max_students_session'))
+
+    def with_resolved_details(self):
+        """
+        Annotates the location and capacity that apply to each session, taken from the session or its course, as
+        resolved_<field>. The get_location_* and get_max_students methods use them instead of loading the course.
+        """
+        annotations = {}
+        for field, diff_field, course_field in self.RESOLVED_FIELDS:
+            annotations['resolved_' + field] = Case(When(**{diff_field: True, 'then': F(field)}),
+                                                    default=F('course__' + course_field),
+                                                    output_field=Session._meta.get_field(field))
+        return self.select_related('course').annotate(**annotations)
+
+
+class Session(RenderedExtraInfoMixin, models.Model):
     start = models.DateTimeField(null=False, blank=False)
     duration = models.DurationField(null=False, blank=False, default=timedelta())
     extra_info = models.TextField(null=True, blank=True)
+    extra_info_html = models.TextField(null=True, blank=True, editable=False)
     max_students_diff_course = models.BooleanField(default=False)
     max_students = models.PositiveSmallIntegerField(null=True, blank=True)
     location_diff_course = models.BooleanField(default=False)
@@ -228,15 +395,22 @@ class Session(models.Model):
     location_street = models.CharField(max_length=50, null=True, blank=True)
     location_number = models.CharField(max_length=5, null=True, blank=True)
     location_city = models.CharField(max_length=50, null=True, blank=True)
+    subscriber_count = models.PositiveIntegerField(default=0, editable=False)
 
     course = models.ForeignKey(Course, related_name='sessions', default=1, blank=True)
     subscribed_users = models.ManyToManyField(User, related_name='sessions', blank=True)
+    recurrence = models.ForeignKey('SessionRecurrence', related_name='sessions', null=True, blank=True,
+                                   on_delete=models.SET_NULL)
+    occurrence_start = models.DateTimeField(null=True, blank=True)
+
+    objects = SessionQuerySet.as_manager()
+
+    SUBSCRIBED = 'subscribed'
+    WAITLISTED = 'waitlisted'
 
     class Meta:
         ordering = ["start"]
-
-    def extra_info_rendered(self):
-        return markdown(self.extra_info)
+        unique_together = ('recurrence', 'occurrence_start')
 
     def user_is_subscribed(self, user):
         return self.subscribed_users.filter(id=user.id).exists()
@@ -244,64 +418,129 @@ class Session(models.Model):
     def time_until(self):
         return self.start - timezone.now()
 
+    def get_end(self):
+        return self.start + self.duration
+
+    def get_location(self):
+        """
+        The full address of the session in one line, falling back to the location of the course.
+        """
+        street = ' '.join(part for part in [self.get_location_street(), self.get_location_number()] if part)
+        return ', '.join(part for part in [self.get_location_short(), street, self.get_location_city()] if part)
+
     def subscribe_user(self, user):
-        if self.max_students and self.subscribed_users.count() >= self.max_students:
-            raise ValidationError(
-                "This session is full",
-                code='full',
-            )
-        self.subscribed_users.add(user)
+        """
+        Takes a place with a conditional update of subscriber_count, so the session can not be overbooked by
+        concurrent subscriptions. The session row is locked before the membership check, so a user joining twice at
+        the same time is only counted once.
+        """
+        with transaction.atomic():
+            Session.objects.select_for_update().get(pk=self.pk)
+            if self.subscribed_users.filter(id=user.id).exists():
+                return
+            sessions = Session.objects.filter(pk=self.pk)
+            if self.max_students:
+                sessions = sessions.filter(subscriber_count__lt=self.max_students)
+            if not sessions.update(subscriber_count=F('subscriber_count') + 1):
+                raise ValidationError(
+                    "This session is full",
+                    code='full',
+                )
+            self.subscribed_users.add(user)
+        self.refresh_from_db(fields=['subscriber_count'])
 
     def unsubscribe_user(self, user):
-        if user not in self.subscribed_users.all():
+        """
+        Frees the place of the user and hands it to the first user on the waitlist.
+        """
+        with transaction.atomic():
+            Session.objects.select_for_update().get(pk=self.pk)
+            if not self.subscribed_users.filter(id=user.id).exists():
+                raise ValidationError(
+                    "User not in session ",
+                    code='not found',
+                )
+            self.subscribed_users.remove(user)
+            Session.objects.filter(pk=self.pk, subscriber_count__gt=0) \
+                .update(subscriber_count=F('subscriber_count') - 1)
+            self.promote_waitlist()
+        self.refresh_from_db(fields=['subscriber_count'])
+
+    def reserve(self, user):
+        """
+        Subscribes the user, or adds the user to the end of the waitlist when the session is full. The session row
+        stays locked until the transaction ends, so concurrent reservations of the same session are handled one by
+        one. Returns SUBSCRIBED or WAITLISTED.
+        """
+        with transaction.atomic():
+            locked_session = Session.objects.select_for_update().get(pk=self.pk)
+            if self.waitlist_entries.filter(user=user).exists():
+                return Session.WAITLISTED
+            try:
+                locked_session.subscribe_user(user)
+            except ValidationError as error:
+                if error.code != 'full':
+                    raise
+                SessionWaitlistEntry.objects.create(session=locked_session, user=user)
+                return Session.WAITLISTED
+        self.refresh_from_db(fields=['subscriber_count'])
+        return Session.SUBSCRIBED
+
+    def promote_waitlist(self):
+        """
+        Subscribes the users of the waitlist in the order they joined it while there are places left, returns the
+        promoted users.
+        """
+        promoted = []
+        with transaction.atomic():
+            locked_session = Session.objects.select_for_update().get(pk=self.pk)
+            for entry in locked_session.waitlist_entries.select_related('user'):
+                try:
+                    locked_session.subscribe_user(entry.user)
+                except ValidationError:
+                    break
+                entry.delete()
+                promoted.append(entry.user)
+        return promoted
+
+    def leave_waitlist(self, user):
+        if not self.waitlist_entries.filter(user=user).delete()[0]:
             raise ValidationError(
-                "User not in session ",
+                "User not on waitlist",
                 code='not found',
             )
-        self.subscribed_users.remove(user)
 
-    def get_location_short(self):
-        if self.location_diff_course:
-            return self.location_short
+    def _get_resolved(self, field, diff_field, course_field):
+        if hasattr(self, 'resolved_' + field):
+            return getattr(self, 'resolved_' + field)
+        if getattr(self, diff_field):
+            return getattr(self, field)
         else:
-            return self.course.location_short
+            return getattr(self.course, course_field)
+
+    def get_location_short(self):
+        return self._get_resolved('location_short', 'location_diff_course', 'location_short')
 
     def get_location_street(self):
-        if self.location_diff_course:
-            return self.location_street
-        else:
-            return self.course.location_street
+        return self._get_resolved('location_street', 'location_diff_course', 'location_street')
 
     def get_location_number(self):
-        if self.location_diff_course:
-            return self.location_number
-        else:
-            return self.course.location_number
+        return self._get_resolved('location_number', 'location_diff_course', 'location_number')
 
     def get_location_city(self):
-        if self.location_diff_course:
-            return self.location_city
-        else:
-            return self.course.location_city
+        return self._get_resolved('location_city', 'location_diff_course', 'location_city')
 
     def get_max_students(self):
-        if self.max_students_diff_course:
-            return self.max_students
-        else:
-            return self.course.max_students_session
+        return self._get_resolved('max_students', 'max_students_diff_course', 'max_students_session')
 
     def is_full(self):
-        if self.max_students_diff_course:
-            if self.max_students:
-                return self.max_students <= self.subscribed_users.count()
-            return False
-        else:
-            if self.course.max_students_session:
-                return self.course.max_students_session <= self.subscribed_users.count()
-            return False
+        max_students = self.get_max_students()
+        if max_students:
+            return max_students <= self.subscriber_count
+        return False
 
     def clean(self):
-        if self.max_students and self.subscribed_users.count() > self.max_students:
+        if self.max_students and self.subscriber_count > self.max_students:
             raise ValidationError(
                 "This session has more students than possible",
                 code='full',
@@ -311,8 +550,27 @@ class Session(models.Model):
         if not self.max_students_diff_course:
             self.max_students = self.course.max_students_session
         self.full_clean()
+        self.update_extra_info_html()
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = _fields_excluding(self, 'subscriber_count')
         super(Session, self).save(*args, **kwargs)
 
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            SessionChangeNotice.record(self, SessionChangeNotice.CANCELLED)
+            if self.recurrence_id:
+                SessionRecurrenceException.objects.get_or_create(recurrence_id=self.recurrence_id,
+                                                                 occurrence_start=self.occurrence_start)
+            return super(Session, self).delete(*args, **kwargs)
+
+    def get_occurrence_key(self):
+        """
+        Identifies an occurrence of a recurrence, also when it is not materialized yet.
+        """
+        if not self.recurrence_id:
+            return None
+        return '%d-%d' % (self.recurrence_id, calendar.timegm(self.occurrence_start.utctimetuple()))
+
     def get_absolute_url(self):
         return reverse_lazy('coursemanaging:session-detail', args=[self.id])
 
@@ -323,6 +581,224 @@ class Session(models.Model):
         return str(self.course) + ' ' + str(self.start.date())
 
 
+class SessionRecurrence(RenderedExtraInfoMixin, models.Model):
+    """
+    A series of sessions of a course, repeating every interval_weeks on the same local time from start until until.
+    The occurrences are expanded on the fly, a Session row is only created for an occurrence when someone subscribes
+    to it or a teacher edits it.
+    """
+    SESSION_FIELDS = ('duration', 'extra_info', 'max_students_diff_course', 'max_students', 'location_diff_course',
+                      'location_short', 'location_street', 'location_number', 'location_city')
+
+    course = models.ForeignKey(Course, related_name='recurrences', on_delete=models.CASCADE)
+    start = models.DateTimeField(null=False, blank=False)
+    until = models.DateTimeField(null=False, blank=False)
+    interval_weeks = models.PositiveSmallIntegerField(default=1)
+    duration = models.DurationField(null=False, blank=False, default=timedelta())
+    extra_info = models.TextField(null=True, blank=True)
+    extra_info_html = models.TextField(null=True, blank=True, editable=False)
+    max_students_diff_course = models.BooleanField(default=False)
+    max_students = models.PositiveSmallIntegerField(null=True, blank=True)
+    location_diff_course = models.BooleanField(default=False)
+    location_short = models.CharField(max_length=30, null=True, blank=True)
+    location_street = models.CharField(max_length=50, null=True, blank=True)
+    location_number = models.CharField(max_length=5, null=True, blank=True)
+    location_city = models.CharField(max_length=50, null=True, blank=True)
+
+    def __str__(self):
+        return str(self.course) + ' ' + str(self.start.date()) + ' - ' + str(self.until.date())
+
+    @classmethod
+    def parse_occurrence_key(cls, key):
+        """
+        Return the recurrence and occurrence start of a key made by Session.get_occurrence_key.
+        """
+        try:
+            recurrence_id, timestamp = (int(part) for part in key.split('-'))
+            recurrence = cls.objects.select_related('course').get(pk=recurrence_id)
+        except (ValueError, cls.DoesNotExist):
+            raise ValidationError(
+                "Unknown occurrence",
+                code='not found',
+            )
+        return recurrence, datetime.fromtimestamp(timestamp, timezone.utc)
+
+    def clean(self):
+        if self.until < self.start:
+            raise ValidationError(
+                "A recurrence can not end before it starts",
+                code='invalid',
+            )
+        if not self.interval_weeks:
+            raise ValidationError(
+                "A recurrence needs an interval of at least one week",
+                code='invalid',
+            )
+
+    def save(self, *args, **kwargs):
+        self.full_clean()
+        self.update_extra_info_html()
+        super(SessionRecurrence, self).save(*args, **kwargs)
+
+    def get_excluded_starts(self, start, end):
+        """
+        The occurrence starts between start and end that are cancelled or already materialized.
+        """
+        excluded = set(self.exceptions.filter(occurrence_start__gte=start, occurrence_start__lt=end)
+                       .values_list('occurrence_start', flat=True))
+        excluded.update(self.sessions.filter(occurrence_start__gte=start, occurrence_start__lt=end)
+                        .values_list('occurrence_start', flat=True))
+        return excluded
+
+    def occurrence_starts(self, start, end, excluded=()):
+        """
+        Yield the starts of the occurrences in [start, end) that are not excluded. The occurrences keep their local
+        wall clock time over daylight saving time changes.
+        """
+        step = timedelta(weeks=self.interval_weeks)
+        first = timezone.localtime(self.start).replace(tzinfo=None)
+        index = max(0, (start - self.start) // step - 1)
+        while True:
+            occurrence = timezone.make_aware(first + index * step, is_dst=False)
+            if occurrence >= end or occurrence > self.until:
+                return
+            if occurrence >= start and occurrence not in excluded:
+                yield occurrence
+            index += 1
+
+    def build_session(self, occurrence_start):
+        """
+        Return an unsaved session for the occurrence, with the settings of the recurrence.
+        """
+        return Session(course=self.course, recurrence=self, occurrence_start=occurrence_start, start=occurrence_start,
+                       extra_info_html=self.extra_info_html,
+                       **{field: getattr(self, field) for field in self.SESSION_FIELDS})
+
+    def build_sessions(self, start, end):
+        return [self.build_session(occurrence_start)
+                for occurrence_start in self.occurrence_starts(start, end, self.get_excluded_starts(start, end))]
+
+    def is_occurrence(self, occurrence_start):
+        end = occurrence_start + timedelta(seconds=1)
+        excluded = self.exceptions.filter(occurrence_start=occurrence_start).values_list('occurrence_start',
+                                                                                         flat=True)
+        return occurrence_start in self.occurrence_starts(occurrence_start, end, set(excluded))
+
+    def materialize(self, occurrence_start):
+        """
+        Return the session of the occurrence, creating it when it does not exist yet.
+        """
+        try:
+            return self.sessions.get(occurrence_start=occurrence_start)
+        except Session.DoesNotExist:
+            pass
+        if not self.is_occurrence(occurrence_start):
+            raise ValidationError(
+                "Unknown occurrence",
+                code='not found',
+            )
+        session = self.build_session(occurrence_start)
+        try:
+            with transaction.atomic():
+                session.save()
+        except (IntegrityError, ValidationError):
+            # created by a concurrent request in the meantime
+            return self.sessions.get(occurrence_start=occurrence_start)
+        return session
+
+    def cancel(self, occurrence_start):
+        """
+        Removes a single occurrence, the session is deleted when it was materialized.
+        """
+        try:
+            self.sessions.get(occurrence_start=occurrence_start).delete()
+        except Session.DoesNotExist:
+            SessionRecurrenceException.objects.get_or_create(recurrence=self, occurrence_start=occurrence_start)
+
+
+class SessionRecurrenceException(models.Model):
+    recurrence = models.ForeignKey(SessionRecurrence, related_name='exceptions', on_delete=models.CASCADE)
+    occurrence_start = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('recurrence', 'occurrence_start')
+
+    def __str__(self):
+        return str(self.recurrence) + ' zonder ' + str(self.occurrence_start)
+
+
+class SessionWaitlistEntry(models.Model):
+    session = models.ForeignKey(Session, related_name='waitlist_entries', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name='session_waitlist_entries', on_delete=models.CASCADE)
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['created', 'id']
+        unique_together = ('session', 'user')
+
+    def __str__(self):
+        return str(self.user) + ' ' + str(self.session)
+
+
+class SessionChangeNotice(models.Model):
+    """
+    A change of a session the subscribed users have to hear about. The recipients are stored when the change is
+    made, since the subscriptions are gone once a session is deleted. The send_session_notices command mails them.
+    """
+    CHANGED = 'changed'
+    CANCELLED = 'cancelled'
+    KIND_CHOICES = ((CHANGED, 'Gewijzigd'), (CANCELLED, 'Geannuleerd'))
+
+    course = models.ForeignKey(Course, related_name='session_change_notices', on_delete=models.CASCADE)
+    # not a foreign key, the notice outlives the session when it is cancelled
+    session_pk = models.PositiveIntegerField()
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    old_start = models.DateTimeField()
+    old_duration = models.DurationField(null=True, blank=True)
+    new_start = models.DateTimeField(null=True, blank=True)
+    new_duration = models.DurationField(null=True, blank=True)
+    created = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ['created', 'id']
+
+    @classmethod
+    def record(cls, session, kind, old_start=None, old_duration=None):
+        """
+        Stores a notice for the current subscribers of the session, nothing is stored for a past session or a
+        session without subscribers.
+        """
+        if old_start is None:
+            old_start = session.start
+        if old_duration is None:
+            old_duration = session.duration
+        user_ids = list(session.subscribed_users.values_list('pk', flat=True))
+        if not user_ids or old_start < timezone.now():
+            return None
+        changed = kind == cls.CHANGED
+        notice = cls.objects.create(course_id=session.course_id, session_pk=session.pk, kind=kind, old_start=old_start,
+                                    old_duration=old_duration, new_start=session.start if changed else None,
+                                    new_duration=session.duration if changed else None)
+        SessionChangeRecipient.objects.bulk_create(SessionChangeRecipient(notice=notice, user_id=user_id)
+                                                   for user_id in user_ids)
+        return notice
+
+    def __str__(self):
+        return str(self.course) + ' ' + self.get_kind_display() + ' ' + str(self.old_start.date())
+
+
+class SessionChangeRecipient(models.Model):
+    notice = models.ForeignKey(SessionChangeNotice, related_name='recipients', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name='session_change_notices', on_delete=models.CASCADE)
+    sent = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        unique_together = ('notice', 'user')
+
+    def __str__(self):
+        return str(self.user) + ' ' + str(self.notice)
+
+
 class NewsItem(models.Model):
     text = models.TextField()
     short_text = models.TextField(null=True, blank=True)
@@ -370,3 +846,32 @@ class NewsBulletin(models.Model):
 
     def __str__(self):
         return self.get_bulletin_level_display()
+
+
+class OutgoingEmail(models.Model):
+    """
+    A mail queued by the OutboxEmailBackend, delivered by the send_outbox command.
+    """
+    subject = models.TextField()
+    body = models.TextField()
+    # json lists of [content, mimetype] and of {filename, mimetype, text or base64}, and a json object
+    alternatives = models.TextField(blank=True)
+    attachments = models.TextField(blank=True)
+    headers = models.TextField(blank=True)
+    content_subtype = models.CharField(max_length=20, default='plain')
+    from_email = models.CharField(max_length=254)
+    to = models.TextField(blank=True)
+    cc = models.TextField(blank=True)
+    bcc = models.TextField(blank=True)
+    reply_to = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    send_after = models.DateTimeField(default=timezone.now, db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    sent = models.DateTimeField(null=True, blank=True, db_index=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return self.subject + ' -> ' + self.to.replace('\n', ', ')
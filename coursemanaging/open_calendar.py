@@ -4,163 +4,136 @@ from datetime import date
 import locale
 
 from django.utils import timezone
-from django.utils.timezone import localtime
+
+from coursemanaging.models import Course, Session
 
 timezone.activate(timezone.get_current_timezone())
 locale.setlocale(locale.LC_ALL, 'nl-be')
 
+
+class CalendarMembership(object):
+    """
+    Snapshot of the courses and sessions a user is linked to, used to highlight the sessions in the calendar
+    without querying the database for every rendered session.
+    """
+
+    def __init__(self, teacher_course_ids=(), student_course_ids=(), subscribed_session_ids=(),
+                 is_authenticated=False):
+        self.teacher_course_ids = frozenset(teacher_course_ids)
+        self.student_course_ids = frozenset(student_course_ids)
+        self.subscribed_session_ids = frozenset(subscribed_session_ids)
+        self.is_authenticated = is_authenticated
+
+    @classmethod
+    def for_user(cls, user):
+        """
+        Loads the snapshot for the given user in three queries, regardless of the number of sessions shown.
+        """
+        if not user.is_authenticated():
+            return cls()
+        return cls(
+            teacher_course_ids=Course.teachers.through.objects.filter(user_id=user.id)
+                .values_list('course_id', flat=True),
+            student_course_ids=Course.students.through.objects.filter(user_id=user.id)
+                .values_list('course_id', flat=True),
+            subscribed_session_ids=Session.subscribed_users.through.objects.filter(user_id=user.id)
+                .values_list('session_id', flat=True),
+            is_authenticated=True,
+        )
+
+    def session_class(self, session_id, course_id):
+        if not self.is_authenticated:
+            return ''
+        if course_id in self.teacher_course_ids:
+            return 'session-teacher'
+        if session_id in self.subscribed_session_ids:
+            return 'session-subscribed'
+        if course_id in self.student_course_ids:
+            return 'session-course-subscribed'
+        return 'session-not-subscribed'
+
+
+class CalendarDay(object):
+    """
+    The sessions, events and building days that start on one local date.
+    """
+    __slots__ = ('sessions', 'events', 'building_days')
+
+    def __init__(self):
+        self.sessions = []
+        self.events = []
+        self.building_days = []
+
+
 class OpenCalendar(HTMLCalendar):
-    def __init__(self, session_list, events, building_days, user):
+    def __init__(self, session_list, events, building_days, membership):
         super(OpenCalendar, self).__init__()
-        self.session_list = self.group_by_day(session_list)
-        self.event_list = self.group_by_day(events)
-        self.building_day_list = self.group_by_day(building_days)
-        self.user = user
+        self.days = self.index_by_date(session_list, events, building_days)
+        self.membership = membership
 
     def formatday(self, day, weekday):
         if day != 0:
             day_html = '<div class="day-head">' + str(day) + '</div>'
             cssclass = 'day day'
-            if date.today() == date(self.year, self.month, day):
+            the_date = date(self.year, self.month, day)
+            if date.today() == the_date:
                 cssclass += '-today'
-            body = ['<div class="day-content">']
 
-            if day in self.session_list or day in self.building_day_list or day in self.event_list:
+            calendar_day = self.days.get(the_date)
+            if calendar_day:
                 cssclass += '-filled'
-                body = ['<div class="day-content">']
-
-            if day in self.event_list:
-                for event in self.event_list[day]:
-                    body.append(
-                        '<a href="%s" class="event-link">%s</a>' % (event.get_absolute_url(), event.event_name))
-
-            if day in self.session_list:
-
-                body.append('<ul class="calendar-day-events">')
-                for session in self.session_list[day]:
-                    session_class = ""
-                    if self.user.is_authenticated():
-                        if session.course.user_is_teacher(self.user):
-                            session_class = 'session-teacher'
-
-                        elif session.user_is_subscribed(self.user):
-                            session_class = 'session-subscribed'
-
-                        elif session.course.user_is_subscribed(self.user):
-                            session_class = 'session-course-subscribed'
-                        else:
-                            session_class = 'session-not-subscribed'
-                    body.append('<li class="%s">' % session_class)
-                    body.append('<time>')
-                    body.append('%s' % (
-                            str(localtime(session.start).hour) + "h" + "{:02d}".format(
-                        localtime(session.start).minute)))
-
-                    end = session.start + session.duration
-                    body.append(' - %s</time>' % (
-                            str(localtime(end).hour) + "h" + "{:02d}".format(
-                        localtime(end).minute)))
-
-                    body.append('<a href="%s">' % session.course.get_absolute_url())
-                    body.append(session.course.course_name)
-                    if session.location_diff_course and session.location_short:
-                        body.append(" @ " + session.location_short)
-                    elif session.course.location_short:
-                        body.append(" @ " + session.course.location_short)
-                    body.append('</a> <div style="clear: both;"></div>')
-                    body.append('</li>')
-                body.append('</ul>')
-
-            if day in self.building_day_list:
-                for building_day in self.building_day_list[day]:
-                    body.append('<a href="%s" class="building-icon"></a>' % building_day.get_absolute_url())
-
-            if day in self.session_list or day in self.event_list or day in self.building_day_list:
-                body.append('</div>')
-                return self.day_cell(cssclass, '%s %s' % (day_html, ''.join(body)))
+                return self.day_cell(cssclass, '%s %s' % (day_html, self.format_day_content(calendar_day)))
 
             return self.day_cell(cssclass, day_html)
         return self.day_cell('noday', '&nbsp;')
 
-    def day_in_session_list(self, day):
-        for day_key in self.session_list.keys():
-            for event in self.session_list.get(day_key):
-                if event.start.date() == day:
-                    return True
+    def format_day_content(self, calendar_day):
+        """
+        Return the events, sessions and building days of a day, shared by the month and the week view.
+        """
+        body = ['<div class="day-content">']
+
+        for event in calendar_day.events:
+            body.append('<a href="%s" class="event-link">%s</a>' % (event.url, event.title))
+
+        if calendar_day.sessions:
+            body.append('<ul class="calendar-day-events">')
+            for session in calendar_day.sessions:
+                body.append(self.format_session(session))
+            body.append('</ul>')
+
+        for building_day in calendar_day.building_days:
+            body.append('<a href="%s" class="building-icon"></a>' % building_day.url)
 
-    def day_in_building_list(self, day):
-        for day_key in self.building_day_list.keys():
-            for event in self.building_day_list.get(day_key):
-                if event.start.date() == day:
-                    return True
+        body.append('</div>')
+        return ''.join(body)
 
-    def day_in_event_list(self, day):
-        for day_key in self.event_list.keys():
-            for event in self.event_list.get(day_key):
-                if event.start.date() == day:
-                    return True
+    def format_session(self, session):
+        """
+        Return a session as a list item, highlighted according to the membership of the user.
+        """
+        body = ['<li class="%s">' % self.membership.session_class(session.id, session.course_id)]
+        body.append('<time>%dh%02d - %dh%02d</time>' % (session.start.hour, session.start.minute,
+                                                       session.end.hour, session.end.minute))
+        body.append('<a href="%s">' % session.url)
+        body.append(session.title)
+        if session.location:
+            body.append(" @ " + session.location)
+        body.append('</a> <div style="clear: both;"></div>')
+        body.append('</li>')
+        return ''.join(body)
 
     def formatday_week_view(self, day):
         day_html = '<div class="week-day-head">' + day_name[day.weekday()] + ' ' + str(day.day) + ' ' + month_name[
             day.month] + '</div>'
         cssclass = 'day day'
-        if date.today() == date(day.year, day.month, day.day):
+        if date.today() == day:
             cssclass += '-today'
-        body = ['<div class="day-content">']
-        filled = False
-        if self.day_in_session_list(day) or self.day_in_building_list(day) or self.day_in_event_list(day):
-            filled = True
-            cssclass += '-filled'
-            body = ['<div class="day-content">']
-
-        if self.day_in_event_list(day):
-            for event in self.event_list[day.day]:
-                body.append(
-                    '<a href="%s" class="event-link">%s</a>' % (event.get_absolute_url(), event.event_name))
 
-        if self.day_in_session_list(day):
-            body.append('<ul class="calendar-day-events">')
-            for session in self.session_list[day.day]:
-                session_class = ""
-                if self.user.is_authenticated():
-                    if session.course.user_is_teacher(self.user):
-                        session_class = 'session-teacher'
-
-                    elif session.user_is_subscribed(self.user):
-                        session_class = 'session-subscribed'
-
-                    elif session.course.user_is_subscribed(self.user):
-                        session_class = 'session-course-subscribed'
-                    else:
-                        session_class = 'session-not-subscribed'
-                body.append('<li class="%s">' % session_class)
-                body.append('<time>')
-                body.append('%s' % (
-                        str(localtime(session.start).hour) + "h" + "{:02d}".format(
-                    localtime(session.start).minute)))
-
-                end = session.start + session.duration
-                body.append(' - %s</time>' % (
-                        str(localtime(end).hour) + "h" + "{:02d}".format(
-                    localtime(end).minute)))
-
-                body.append('<a href="%s">' % session.course.get_absolute_url())
-                body.append(session.course.course_name)
-                if session.location_diff_course and session.location_short:
-                    body.append(" @ " + session.location_short)
-                elif session.course.location_short:
-                    body.append(" @ " + session.course.location_short)
-                body.append('</a> <div style="clear: both;"></div>')
-                body.append('</li>')
-            body.append('</ul>')
-
-        if self.day_in_building_list(day):
-            for building_day in self.building_day_list[day.day]:
-                body.append('<a href="%s" class="building-icon"></a>' % building_day.get_absolute_url())
-
-        if filled:
-            body.append('</div>')
-            return self.week_day_cell(cssclass, '%s %s' % (day_html, ''.join(body)))
+        calendar_day = self.days.get(day)
+        if calendar_day:
+            cssclass += '-filled'
+            return self.week_day_cell(cssclass, '%s %s' % (day_html, self.format_day_content(calendar_day)))
 
         return self.week_day_cell(cssclass, day_html)
 
@@ -196,16 +169,22 @@ class OpenCalendar(HTMLCalendar):
                '<th colspan="3" class="calendar-month-title">%s</th>' % s + \
                '<th colspan="1"><span id="month-next" class="fa fa-angle-right fa-2x month-nav month-next"></span></th><th class="help-cell"><div class="legende"><h2>legende</h2><p class="event-link-legend"><span class="bd-ex"></span> Bouwdag</p><p class="session-subscribed">Ingeschreven voor les</p><p class="session-not-subscribed">Niet ingeschreven</p></div></th></tr>'
 
-    def group_by_day(self, entry_list):
-        result = defaultdict()
-        for session in entry_list:
-            if localtime(session.start).day not in result:
-                result[localtime(session.start).day] = [session]
-            else:
-                result[localtime(session.start).day].append(session)
-        for result_list in result.values():
-            result_list.sort(key=lambda s: s.start)
-        return result
+    def index_by_date(self, session_list, events, building_days):
+        """
+        Group the calendar entries by the local date they start on, so every day is rendered with a single lookup.
+        """
+        result = defaultdict(CalendarDay)
+        for session in session_list:
+            result[session.start.date()].sessions.append(session)
+        for event in events:
+            result[event.start.date()].events.append(event)
+        for building_day in building_days:
+            result[building_day.start.date()].building_days.append(building_day)
+        for calendar_day in result.values():
+            calendar_day.sessions.sort(key=lambda s: s.start)
+            calendar_day.events.sort(key=lambda e: e.start)
+            calendar_day.building_days.sort(key=lambda b: b.start)
+        return dict(result)
 
     def day_cell(self, cssclass, body):
         return '<td class="%s">%s</td>' % (cssclass, body)
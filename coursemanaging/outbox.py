@@ -0,0 +1,138 @@
+import base64
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import connection as db_connection, transaction
+from django.utils import timezone
+
+from coursemanaging.models import OutgoingEmail
+
+
+def _join(addresses):
+    return '\n'.join(addresses or ())
+
+
+def _split(addresses):
+    return [address for address in addresses.split('\n') if address]
+
+
+def _dump(value):
+    return json.dumps(value) if value else ''
+
+
+def _load(value, default):
+    return json.loads(value) if value else default
+
+
+def _dump_attachments(message):
+    """
+    Attachments given as (filename, content, mimetype), an attached MIME object can not be stored.
+    """
+    attachments = []
+    for attachment in message.attachments:
+        if not isinstance(attachment, tuple):
+            raise ValueError('The outbox can not store the MIME attachment of "%s"' % message.subject)
+        filename, content, mimetype = attachment
+        if isinstance(content, str):
+            attachments.append({'filename': filename, 'mimetype': mimetype, 'text': content})
+        else:
+            attachments.append({'filename': filename, 'mimetype': mimetype,
+                                'base64': base64.b64encode(content).decode('ascii')})
+    return attachments
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    """
+    Stores the mails in the outbox instead of sending them, so a request never waits for the mail server. Set
+    EMAIL_BACKEND to this backend and OUTBOX_DELIVERY_BACKEND to the backend send_outbox delivers with.
+    """
+
+    def send_messages(self, email_messages):
+        outgoing = []
+        for message in email_messages:
+            outgoing.append(OutgoingEmail(subject=message.subject, body=message.body,
+                                          alternatives=_dump(getattr(message, 'alternatives', None)),
+                                          attachments=_dump(_dump_attachments(message)),
+                                          headers=_dump(message.extra_headers),
+                                          content_subtype=message.content_subtype, from_email=message.from_email,
+                                          to=_join(message.to), cc=_join(message.cc), bcc=_join(message.bcc),
+                                          reply_to=_join(message.reply_to)))
+        OutgoingEmail.objects.bulk_create(outgoing)
+        return len(outgoing)
+
+
+def build_message(outgoing_email, connection):
+    message = EmailMultiAlternatives(outgoing_email.subject, outgoing_email.body, outgoing_email.from_email,
+                                     _split(outgoing_email.to), _split(outgoing_email.bcc), connection=connection,
+                                     headers=_load(outgoing_email.headers, {}), cc=_split(outgoing_email.cc),
+                                     reply_to=_split(outgoing_email.reply_to))
+    message.content_subtype = outgoing_email.content_subtype
+    for content, mimetype in _load(outgoing_email.alternatives, []):
+        message.attach_alternative(content, mimetype)
+    for attachment in _load(outgoing_email.attachments, []):
+        content = attachment['text'] if 'text' in attachment else base64.b64decode(attachment['base64'])
+        message.attach(attachment['filename'], content, attachment['mimetype'])
+    return message
+
+
+def get_retry_delay(attempts):
+    """
+    Exponential backoff starting at OUTBOX_RETRY_DELAY seconds, capped at OUTBOX_MAX_RETRY_DELAY seconds.
+    """
+    delay = getattr(settings, 'OUTBOX_RETRY_DELAY', 60) * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, getattr(settings, 'OUTBOX_MAX_RETRY_DELAY', 60 * 60 * 6)))
+
+
+def claim_due(batch_size, max_attempts):
+    """
+    Claims a batch of due mails in a short transaction by moving their send_after past OUTBOX_CLAIM_TIMEOUT, so
+    other workers skip them while they are sent. A mail of a worker that died is sent again after the timeout.
+    Rows locked by another worker are skipped where the database supports it, otherwise the lock is waited for.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = OutgoingEmail.objects.filter(sent__isnull=True, attempts__lt=max_attempts, send_after__lte=now)
+        if db_connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        else:
+            due = due.select_for_update()
+        claimed = list(due.order_by('send_after', 'id')[:batch_size])
+        claim_timeout = timedelta(seconds=getattr(settings, 'OUTBOX_CLAIM_TIMEOUT', 10 * 60))
+        OutgoingEmail.objects.filter(pk__in=[outgoing_email.pk for outgoing_email in claimed]) \
+            .update(send_after=now + claim_timeout)
+    return claimed
+
+
+def deliver_outbox(batch_size=100):
+    """
+    Delivers one batch of due mails over a single connection and returns the number of (sent, failed) mails. The
+    outcome of each mail is stored right after it was sent, no transaction stays open while talking to the mail
+    server. A failed mail is tried again later until it failed OUTBOX_MAX_ATTEMPTS times.
+    """
+    due = claim_due(batch_size, getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8))
+    if not due:
+        return 0, 0
+    connection = get_connection(getattr(settings, 'OUTBOX_DELIVERY_BACKEND',
+                                        'django.core.mail.backends.smtp.EmailBackend'))
+    sent = failed = 0
+    try:
+        for outgoing_email in due:
+            try:
+                connection.send_messages([build_message(outgoing_email, connection)])
+            except Exception as error:
+                attempts = outgoing_email.attempts + 1
+                OutgoingEmail.objects.filter(pk=outgoing_email.pk).update(
+                    attempts=attempts, send_after=timezone.now() + get_retry_delay(attempts),
+                    last_error='%s: %s' % (type(error).__name__, error))
+                failed += 1
+                # the connection may be broken, the backend opens a new one for the next mail
+                connection.close()
+            else:
+                OutgoingEmail.objects.filter(pk=outgoing_email.pk).update(sent=timezone.now())
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
@@ -0,0 +1,100 @@
+import hashlib
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+from coursemanaging.calendar_cache import CALENDAR_VERSION_KEY, get_calendar_version
+
+CONTENT_VERSION_KEY = 'pages:version'
+CSRF_TOKEN_MARKER = '%%csrf_token%%'
+
+
+def get_content_version():
+    """
+    Version of the news, bulletins and albums shown on the pages, initialised like the calendar version.
+    """
+    cache.add(CONTENT_VERSION_KEY, int(time.time() * 1000), None)
+    return cache.get(CONTENT_VERSION_KEY)
+
+
+def bump_content_version():
+    try:
+        cache.incr(CONTENT_VERSION_KEY)
+    except ValueError:
+        get_content_version()
+
+
+def get_page_versions():
+    """
+    The content and calendar version in a single cache round trip for the common case.
+    """
+    versions = cache.get_many([CONTENT_VERSION_KEY, CALENDAR_VERSION_KEY])
+    if CONTENT_VERSION_KEY not in versions:
+        versions[CONTENT_VERSION_KEY] = get_content_version()
+    if CALENDAR_VERSION_KEY not in versions:
+        versions[CALENDAR_VERSION_KEY] = get_calendar_version()
+    return versions[CONTENT_VERSION_KEY], versions[CALENDAR_VERSION_KEY]
+
+
+def get_page_cache_key(request):
+    content_version, calendar_version = get_page_versions()
+    path = hashlib.md5(request.path.encode('utf-8')).hexdigest()
+    return 'pages:%s:%s:%s:%s' % (content_version, calendar_version, date.today().isoformat(), path)
+
+
+def get_page_cache_timeout():
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def is_prerendering(request):
+    """
+    Whether the page is rendered to a file by prerender_pages.
+    """
+    return getattr(request, 'prerendering', False)
+
+
+class CsrfTokenMarkerMixin(object):
+    """
+    Renders the marker instead of the csrf token when the page is shared between visitors. The page cache fills in
+    the token of the visitor, on a pre-rendered page opengym.js fetches one from the csrf-token view.
+    """
+    use_csrf_token_marker = False
+
+    def get_context_data(self, **kwargs):
+        context = super(CsrfTokenMarkerMixin, self).get_context_data(**kwargs)
+        if self.use_csrf_token_marker or is_prerendering(self.request):
+            context['csrf_token'] = CSRF_TOKEN_MARKER
+        return context
+
+
+class AnonymousPageCacheMixin(CsrfTokenMarkerMixin):
+    """
+    Serves the page to anonymous visitors from the cache. The key contains the content and calendar versions, so
+    the signals that bump them invalidate the page. The markup is cached with a marker instead of the csrf token,
+    every visitor gets his own token filled in. Requests with a query string are not cached, so visitors can not
+    fill the cache with an entry per made up query.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET' or request.GET or request.user.is_authenticated() or is_prerendering(request):
+            return super(AnonymousPageCacheMixin, self).dispatch(request, *args, **kwargs)
+        key = get_page_cache_key(request)
+        content = cache.get(key)
+        if content is None:
+            self.use_csrf_token_marker = True
+            response = super(AnonymousPageCacheMixin, self).dispatch(request, *args, **kwargs)
+            if response.status_code != 200 or not hasattr(response, 'render'):
+                return response
+            content = response.render().content.decode(response.charset)
+            cache.set(key, content, get_page_cache_timeout())
+        return HttpResponse(content.replace(CSRF_TOKEN_MARKER, get_token(request)))
+
+    def get_context_data(self, **kwargs):
+        context = super(AnonymousPageCacheMixin, self).get_context_data(**kwargs)
+        context['content_version'] = get_content_version()
+        context['page_cache_timeout'] = get_page_cache_timeout()
+        return context
@@ -0,0 +1,110 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import transaction
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from coursemanaging.models import Event, NewsItem
+from mostaardimgur.models import ImgurAlbum
+
+# the pages that show each kind of content, building day details are left out because they require a login
+LANDING = 'landing'
+ACTIVITIES = 'activities'
+EVENTS = 'events'
+NEWS = 'news'
+ALBUMS = 'albums'
+PAGE_GROUPS = (LANDING, ACTIVITIES, EVENTS, NEWS, ALBUMS)
+
+
+def is_enabled():
+    return bool(getattr(settings, 'PRERENDER_ROOT', None))
+
+
+def get_page_paths(group, pk=None):
+    """
+    The paths of the pages in a group, or only the detail page of the object pk when given.
+    """
+    if group == LANDING:
+        return [reverse('coursemanaging:landing')]
+    if group == ACTIVITIES:
+        return [reverse('coursemanaging:activities')]
+    if group == EVENTS:
+        pks = [pk] if pk is not None else Event.objects.values_list('pk', flat=True)
+        return [reverse('coursemanaging:event-detail', args=[event_pk]) for event_pk in pks]
+    if group == NEWS:
+        # every news page lists all news items, so a change affects all of them
+        pks = set(NewsItem.objects.values_list('pk', flat=True))
+        if pk is not None:
+            pks.add(pk)
+        return [reverse('coursemanaging:news')] + [reverse('coursemanaging:news', args=[news_item_pk])
+                                                   for news_item_pk in sorted(pks)]
+    if group == ALBUMS:
+        pks = [pk] if pk is not None else ImgurAlbum.objects.values_list('pk', flat=True)
+        return [reverse('mostaardimgur:album-list')] + [reverse('mostaardimgur:album-detail', args=[album_pk])
+                                                        for album_pk in pks]
+    raise ValueError('Unknown page group %s' % group)
+
+
+def get_page_file(path):
+    return os.path.join(settings.PRERENDER_ROOT, path.strip('/'), 'index.html')
+
+
+def render_page(path):
+    """
+    Render the page at path as an anonymous visitor would see it, returns None when the view does not answer with
+    a regular page.
+    """
+    request = RequestFactory().get(path)
+    request.user = AnonymousUser()
+    # the views render the csrf token marker, the browser fetches a token of its own
+    request.prerendering = True
+    match = resolve(path)
+    response = match.func(request, *match.args, **match.kwargs)
+    if response.status_code != 200:
+        return None
+    if hasattr(response, 'render'):
+        response.render()
+    return response.content
+
+
+def write_page(path):
+    """
+    Replace the file of the page atomically, so the proxy never serves a half written page.
+    """
+    content = render_page(path)
+    if content is None:
+        remove_page(path)
+        return False
+    file_name = get_page_file(path)
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(file_name), delete=False) as page_file:
+        page_file.write(content)
+    os.chmod(page_file.name, 0o644)
+    os.replace(page_file.name, file_name)
+    return True
+
+
+def remove_page(path):
+    try:
+        os.remove(get_page_file(path))
+    except FileNotFoundError:
+        pass
+
+
+def invalidate_pages(*groups, pk=None):
+    """
+    Removes the files of the pages after the transaction commits, the proxy then passes the requests to Django
+    until the pages are rendered again with prerender_pages --missing.
+    """
+    if not is_enabled():
+        return
+
+    def remove():
+        for group in groups:
+            for path in get_page_paths(group, pk):
+                remove_page(path)
+
+    transaction.on_commit(remove)
@@ -0,0 +1,184 @@
+import csv
+import io
+from datetime import timedelta
+
+import pytz
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime, parse_duration
+
+from coursemanaging.calendar_cache import bump_calendar_version
+from coursemanaging.ical import iter_events, parse_datetime as parse_ical_datetime, unescape_text
+from coursemanaging.models import Course, Session, render_markdown
+from coursemanaging.prerender import invalidate_pages as invalidate_prerendered_pages, LANDING, ACTIVITIES
+
+CSV_COLUMNS = ('course', 'start', 'duration', 'max_students', 'extra_info', 'location_short', 'location_street',
+               'location_number', 'location_city')
+LOCATION_FIELDS = ('location_short', 'location_street', 'location_number', 'location_city')
+FORMATS = ('csv', 'ics')
+
+
+class ScheduleRow(object):
+    """
+    The values of one session to import and the line it was read from.
+    """
+
+    def __init__(self, line, course, start, duration, max_students=None, extra_info=None, **location):
+        self.line = line
+        self.course = course
+        self.start = start
+        self.duration = duration
+        self.max_students = max_students
+        self.extra_info = extra_info
+        self.location = location
+
+
+class ScheduleImport(object):
+    """
+    Validates all rows of a schedule in memory against the courses loaded once, and inserts the sessions in batches
+    when no row has an error. Session.save is bypassed, so everything it checks or fills in is done here.
+    """
+
+    def __init__(self):
+        self.courses = Course.objects.in_bulk()
+        self.courses_by_name = {}
+        for course in self.courses.values():
+            self.courses_by_name.setdefault(course.course_name.strip().lower(), []).append(course)
+        self.sessions = []
+        self.errors = []
+        self.created = 0
+
+    def add_error(self, line, message):
+        self.errors.append((line, message))
+
+    def resolve_course(self, value):
+        """
+        A course is given by its id or by its name.
+        """
+        value = (value or '').strip()
+        if value.isdigit():
+            return self.courses.get(int(value))
+        courses = self.courses_by_name.get(value.lower(), [])
+        if len(courses) == 1:
+            return courses[0]
+        return None
+
+    def add_row(self, row):
+        course = self.resolve_course(row.course)
+        if course is None:
+            self.add_error(row.line, "Onbekende of dubbelzinnige les '%s'" % row.course)
+            return
+        if row.start is None:
+            self.add_error(row.line, "Ongeldig tijdstip")
+            return
+        if row.duration is None or row.duration <= timedelta():
+            self.add_error(row.line, "Ongeldige duur")
+            return
+        session = Session(course=course, start=row.start, duration=row.duration, extra_info=row.extra_info or None)
+        session.extra_info_html = render_markdown(session.extra_info)
+        if row.max_students:
+            try:
+                session.max_students = int(row.max_students)
+                if session.max_students < 0:
+                    raise ValueError
+            except ValueError:
+                self.add_error(row.line, "Ongeldig maximum aantal deelnemers '%s'" % row.max_students)
+                return
+            session.max_students_diff_course = True
+        else:
+            session.max_students = course.max_students_session
+        for field in LOCATION_FIELDS:
+            value = (row.location.get(field) or '').strip()
+            if value:
+                if len(value) > Session._meta.get_field(field).max_length:
+                    self.add_error(row.line, "Te lange waarde voor %s" % field)
+                    return
+                setattr(session, field, value)
+                session.location_diff_course = True
+        self.sessions.append(session)
+
+    def read_csv(self, text):
+        """
+        Rows with the CSV_COLUMNS as header, course and start and duration are required.
+        """
+        reader = csv.DictReader(io.StringIO(text))
+        missing = {'course', 'start', 'duration'} - set(reader.fieldnames or ())
+        if missing:
+            self.add_error(1, "Ontbrekende kolommen: %s" % ', '.join(sorted(missing)))
+            return
+        for values in reader:
+            values = {key: value for key, value in values.items() if key in CSV_COLUMNS}
+            start = _parse_local_datetime(values.pop('start', None))
+            duration = parse_duration((values.pop('duration', None) or '').strip())
+            self.add_row(ScheduleRow(reader.line_num, values.pop('course'), start, duration, **values))
+
+    def read_ics(self, text):
+        """
+        VEVENTs with the course id in X-OPENGYM-COURSE or the course name as SUMMARY.
+        """
+        for line, properties in iter_events(text):
+            course = properties.get('X-OPENGYM-COURSE', properties.get('SUMMARY', ({}, '')))[1]
+            start = end = duration = None
+            try:
+                start = parse_ical_datetime(properties['DTSTART'][1], properties['DTSTART'][0])
+                if 'DTEND' in properties:
+                    end = parse_ical_datetime(properties['DTEND'][1], properties['DTEND'][0])
+            except (KeyError, ValueError):
+                # reported as an invalid time, also when only the end is wrong
+                start = None
+            if start and end:
+                duration = end - start
+            elif 'DURATION' in properties:
+                duration = parse_duration(properties['DURATION'][1])
+            location = properties.get('LOCATION', ({}, ''))[1]
+            extra_info = properties.get('DESCRIPTION', ({}, ''))[1]
+            self.add_row(ScheduleRow(line, unescape_text(course), start, duration,
+                                     extra_info=unescape_text(extra_info),
+                                     location_short=unescape_text(location)))
+
+    def read(self, text, format):
+        if format == 'ics':
+            self.read_ics(text)
+        else:
+            self.read_csv(text)
+
+    def save(self):
+        """
+        Insert the sessions when all rows are valid.
+        """
+        if self.errors or not self.sessions:
+            return
+        with transaction.atomic():
+            Session.objects.bulk_create(self.sessions, batch_size=getattr(settings, 'SCHEDULE_IMPORT_BATCH_SIZE', 500))
+        # bulk_create does not send post_save
+        bump_calendar_version()
+        invalidate_prerendered_pages(LANDING, ACTIVITIES)
+        self.created = len(self.sessions)
+
+
+def _parse_local_datetime(value):
+    try:
+        moment = parse_datetime((value or '').strip())
+        if moment is not None and timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+    except (ValueError, pytz.InvalidTimeError):
+        # also a local time skipped or repeated by a DST change
+        return None
+    return moment
+
+
+def guess_format(file_name):
+    return 'ics' if file_name.lower().endswith('.ics') else 'csv'
+
+
+def import_schedule(text, format='csv', dry_run=False):
+    """
+    Return the ScheduleImport of the text, the sessions are only inserted when every row is valid and dry_run is
+    not set.
+    """
+    schedule_import = ScheduleImport()
+    schedule_import.read(text, format)
+    if not dry_run:
+        schedule_import.save()
+    return schedule_import
@@ -0,0 +1,72 @@
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from coursemanaging.models import SessionChangeNotice, SessionChangeRecipient
+
+
+def get_notice_window():
+    """
+    Changes to the schedule a teacher makes within this window reach each subscriber as a single mail.
+    """
+    return timedelta(seconds=getattr(settings, 'SESSION_NOTICE_WINDOW', 15 * 60))
+
+
+def merge_notices(notices):
+    """
+    Collapses the notices of one user to one change per session, from the first known start and duration to the
+    last state. A session moved back to its original time and duration is left out.
+    """
+    changes = OrderedDict()
+    for notice in notices:
+        change = changes.setdefault(notice.session_pk, {'course': notice.course, 'old_start': notice.old_start,
+                                                        'old_duration': notice.old_duration})
+        change.update(kind=notice.kind, new_start=notice.new_start, new_duration=notice.new_duration)
+    return [change for change in changes.values()
+            if change['kind'] == SessionChangeNotice.CANCELLED or change['new_start'] != change['old_start']
+            or change['new_duration'] != change['old_duration']]
+
+
+def build_messages(recipients, domain):
+    """
+    One message per user for the pending recipient rows, ordered by user and creation of the notice.
+    """
+    messages = []
+    by_user = OrderedDict()
+    for recipient in recipients:
+        by_user.setdefault(recipient.user, []).append(recipient.notice)
+    for user, notices in by_user.items():
+        changes = merge_notices(notices)
+        if not changes or not user.email:
+            continue
+        body = render_to_string('coursemanaging/session-change-email.html',
+                                {'user': user, 'changes': changes, 'domain': domain})
+        messages.append(EmailMessage('Wijzigingen in je lessen bij Open Gym', body, to=[user.email]))
+    return messages
+
+
+def send_session_notices(now=None):
+    """
+    Mails the pending notices of every user whose last notice is older than the notice window, and returns the
+    number of mails. The recipients and their notices are loaded in one query and all mails are sent over one
+    connection.
+    """
+    now = now or timezone.now()
+    recipients = list(SessionChangeRecipient.objects.filter(sent__isnull=True)
+                      .select_related('user', 'notice__course')
+                      .order_by('user_id', 'notice__created', 'notice_id'))
+    # a user with a recent notice waits until the teacher is done editing
+    waiting = {recipient.user_id for recipient in recipients
+               if recipient.notice.created > now - get_notice_window()}
+    recipients = [recipient for recipient in recipients if recipient.user_id not in waiting]
+    if not recipients:
+        return 0
+    messages = build_messages(recipients, Site.objects.get_current().domain)
+    get_connection().send_messages(messages)
+    SessionChangeRecipient.objects.filter(pk__in=[recipient.pk for recipient in recipients]).update(sent=now)
+    return len(messages)
@@ -0,0 +1,96 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from coursemanaging.calendar_cache import bump_calendar_version, bump_user_schedule_versions
+from coursemanaging.models import Course, Session, Event, BuildingDay, SessionRecurrence, SessionRecurrenceException, \
+    NewsItem, NewsBulletin
+from coursemanaging.page_cache import bump_content_version
+from coursemanaging.prerender import invalidate_pages as invalidate_prerendered_pages, LANDING, ACTIVITIES, EVENTS, \
+    NEWS, ALBUMS
+from mostaardimgur.models import ImgurAlbum, ImgurImage
+
+
+@receiver(post_save, sender=Session)
+@receiver(post_delete, sender=Session)
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+@receiver(post_save, sender=BuildingDay)
+@receiver(post_delete, sender=BuildingDay)
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=SessionRecurrence)
+@receiver(post_delete, sender=SessionRecurrence)
+@receiver(post_save, sender=SessionRecurrenceException)
+@receiver(post_delete, sender=SessionRecurrenceException)
+def invalidate_calendar(sender, **kwargs):
+    bump_calendar_version()
+
+
+@receiver(m2m_changed, sender=Session.subscribed_users.through)
+@receiver(m2m_changed, sender=Course.teachers.through)
+@receiver(m2m_changed, sender=Course.students.through)
+def invalidate_user_schedule(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            bump_user_schedule_versions([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        bump_user_schedule_versions(pk_set)
+    elif action == 'pre_clear':
+        bump_user_schedule_versions(sender.objects.filter(**{'%s_id' % instance._meta.model_name: instance.pk})
+                                    .values_list('user_id', flat=True))
+
+
+@receiver(post_save, sender=NewsItem)
+@receiver(post_delete, sender=NewsItem)
+@receiver(post_save, sender=NewsBulletin)
+@receiver(post_delete, sender=NewsBulletin)
+@receiver(post_save, sender=ImgurAlbum)
+@receiver(post_delete, sender=ImgurAlbum)
+@receiver(post_save, sender=ImgurImage)
+@receiver(post_delete, sender=ImgurImage)
+def invalidate_pages(sender, **kwargs):
+    bump_content_version()
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Session)
+@receiver(post_delete, sender=Session)
+@receiver(post_save, sender=SessionRecurrence)
+@receiver(post_delete, sender=SessionRecurrence)
+@receiver(post_save, sender=SessionRecurrenceException)
+@receiver(post_delete, sender=SessionRecurrenceException)
+@receiver(post_save, sender=BuildingDay)
+@receiver(post_delete, sender=BuildingDay)
+def invalidate_prerendered_activities(sender, **kwargs):
+    invalidate_prerendered_pages(LANDING, ACTIVITIES)
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_prerendered_event(sender, instance, **kwargs):
+    invalidate_prerendered_pages(LANDING, ACTIVITIES, EVENTS, pk=instance.pk)
+
+
+@receiver(post_save, sender=NewsItem)
+@receiver(post_delete, sender=NewsItem)
+def invalidate_prerendered_news(sender, instance, **kwargs):
+    invalidate_prerendered_pages(LANDING, NEWS, pk=instance.pk)
+
+
+@receiver(post_save, sender=NewsBulletin)
+@receiver(post_delete, sender=NewsBulletin)
+def invalidate_prerendered_landing(sender, **kwargs):
+    invalidate_prerendered_pages(LANDING)
+
+
+@receiver(post_save, sender=ImgurAlbum)
+@receiver(post_delete, sender=ImgurAlbum)
+def invalidate_prerendered_album(sender, instance, **kwargs):
+    invalidate_prerendered_pages(LANDING, ALBUMS, pk=instance.pk)
+
+
+@receiver(post_save, sender=ImgurImage)
+@receiver(post_delete, sender=ImgurImage)
+def invalidate_prerendered_album_image(sender, instance, **kwargs):
+    invalidate_prerendered_pages(LANDING, ALBUMS, pk=instance.imgur_album_id)
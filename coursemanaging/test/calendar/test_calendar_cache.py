@@ -0,0 +1,60 @@
+import datetime
+import pytz
+
+from django.core.cache import cache
+from django.test import TestCase
+from datetime import timedelta
+
+from coursemanaging.calendar_cache import get_calendar_version, get_calendar_html
+from coursemanaging.models import Course, Session, User
+from coursemanaging.open_calendar import CalendarMembership
+
+utc = pytz.UTC
+
+
+class CalendarCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(course_name="test_course", course_level=1, build_up_sessions=False,
+                                            description="test_description")
+        self.session = Session.objects.create(course=self.course,
+                                              start=utc.localize(datetime.datetime(2017, 12, 5, 18)),
+                                              duration=timedelta(hours=2))
+        self.user = User.objects.create(email="john", first_name="john", last_name="doe",
+                                        birthdate=utc.localize(datetime.datetime(2017, 12, 1)))
+
+    def get_html(self, membership):
+        return get_calendar_html(membership, month=(2017, 12))[0]
+
+    def test_overlay_per_user(self):
+        anonymous_html = self.get_html(CalendarMembership())
+        self.course.teachers.add(self.user)
+        teacher_html = self.get_html(CalendarMembership.for_user(self.user))
+        self.assertNotIn('session-teacher', anonymous_html)
+        self.assertIn('session-teacher', teacher_html)
+        self.assertNotIn('%%session', teacher_html)
+
+    def test_cache_hit_without_queries(self):
+        self.get_html(CalendarMembership())
+        with self.assertNumQueries(0):
+            self.get_html(CalendarMembership())
+
+    def test_save_invalidates(self):
+        version = get_calendar_version()
+        self.session.save()
+        self.assertNotEqual(version, get_calendar_version())
+
+    def test_month_and_week_loaded_together(self):
+        with self.assertNumQueries(4):
+            calendar_month, calendar_week = get_calendar_html(CalendarMembership(), month=(2017, 12),
+                                                              week=datetime.date(2017, 12, 5))
+        self.assertIn('test_course', calendar_month)
+        self.assertIn('test_course', calendar_week)
+
+    def test_session_without_location_name_shows_course_location(self):
+        self.course.location_short = "Park"
+        self.course.save()
+        self.session.location_diff_course = True
+        self.session.location_short = ""
+        self.session.save()
+        self.assertIn('test_course @ Park', self.get_html(CalendarMembership()))
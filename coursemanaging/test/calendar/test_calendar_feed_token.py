@@ -0,0 +1,27 @@
+import datetime
+
+from django.test import TestCase
+
+from coursemanaging.models import User
+from coursemanaging.tokens import calendar_feed_token
+
+
+class CalendarFeedTokenTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="john@opengym.be", first_name="john", last_name="doe",
+                                        birthdate=datetime.date(1990, 1, 1))
+
+    def test_token_resolves_user(self):
+        token = calendar_feed_token.make_token(self.user)
+        self.assertEquals(calendar_feed_token.get_user(token), self.user)
+
+    def test_reset_revokes_token(self):
+        token = calendar_feed_token.make_token(self.user)
+        self.user.reset_calendar_feed_key()
+        self.assertIsNone(calendar_feed_token.get_user(token))
+        self.assertEquals(calendar_feed_token.get_user(calendar_feed_token.make_token(self.user)), self.user)
+
+    def test_tampered_token(self):
+        token = calendar_feed_token.make_token(self.user)
+        self.assertIsNone(calendar_feed_token.get_user('0' + token))
+        self.assertIsNone(calendar_feed_token.get_user(token + 'x'))
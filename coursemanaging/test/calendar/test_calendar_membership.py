@@ -0,0 +1,53 @@
+import datetime
+import pytz
+
+from django.contrib.auth.models import AnonymousUser
+from django.test import TestCase
+from datetime import timedelta
+
+from coursemanaging.models import Course, Session, User
+from coursemanaging.open_calendar import CalendarMembership
+
+utc = pytz.UTC
+
+
+class CalendarMembershipTest(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(course_name="test_course", course_level=1, build_up_sessions=False,
+                                            description="test_description")
+        self.other_course = Course.objects.create(course_name="other_course", course_level=1,
+                                                  build_up_sessions=False, description="test_description")
+        self.session = Session.objects.create(course=self.course,
+                                              start=utc.localize(datetime.datetime(2017, 12, 1)),
+                                              duration=timedelta(hours=4))
+        self.user = User.objects.create(email="john", first_name="john", last_name="doe",
+                                        birthdate=utc.localize(datetime.datetime(2017, 12, 1)))
+
+    def test_anonymous_user(self):
+        membership = CalendarMembership.for_user(AnonymousUser())
+        self.assertEquals(membership.session_class(self.session.id, self.course.id), '')
+
+    def test_not_subscribed(self):
+        membership = CalendarMembership.for_user(self.user)
+        self.assertEquals(membership.session_class(self.session.id, self.course.id), 'session-not-subscribed')
+
+    def test_teacher(self):
+        self.course.teachers.add(self.user)
+        membership = CalendarMembership.for_user(self.user)
+        self.assertEquals(membership.session_class(self.session.id, self.course.id), 'session-teacher')
+        self.assertEquals(membership.session_class(None, self.other_course.id), 'session-not-subscribed')
+
+    def test_subscribed(self):
+        self.session.subscribed_users.add(self.user)
+        self.course.students.add(self.user)
+        membership = CalendarMembership.for_user(self.user)
+        self.assertEquals(membership.session_class(self.session.id, self.course.id), 'session-subscribed')
+
+    def test_course_subscribed(self):
+        self.course.students.add(self.user)
+        membership = CalendarMembership.for_user(self.user)
+        self.assertEquals(membership.session_class(self.session.id, self.course.id), 'session-course-subscribed')
+
+    def test_constant_number_of_queries(self):
+        with self.assertNumQueries(3):
+            CalendarMembership.for_user(self.user)
@@ -0,0 +1,33 @@
+import datetime
+import pytz
+
+from django.test import SimpleTestCase
+from datetime import timedelta
+
+from coursemanaging.ical import escape_text, fold_line, format_event, iter_calendar
+
+utc = pytz.UTC
+
+
+class IcalTest(SimpleTestCase):
+    def test_escape_text(self):
+        self.assertEquals(escape_text('a,b;c\\d\ne'), 'a\\,b\\;c\\\\d\\ne')
+
+    def test_fold_short_line(self):
+        self.assertEquals(fold_line('SUMMARY:short'), 'SUMMARY:short\r\n')
+
+    def test_fold_long_line(self):
+        folded = fold_line('DESCRIPTION:' + 'é' * 100)
+        lines = folded.split('\r\n')
+        self.assertTrue(all(len(line.encode('utf-8')) <= 75 for line in lines))
+        self.assertEquals(''.join(line[1:] if i else line for i, line in enumerate(lines)),
+                          'DESCRIPTION:' + 'é' * 100)
+
+    def test_calendar(self):
+        start = utc.localize(datetime.datetime(2017, 12, 1, 18))
+        event = format_event('session-1@opengym', start, start + timedelta(hours=2), 'Boulderen', location='Park')
+        calendar = ''.join(iter_calendar('Open Gym', [event]))
+        self.assertTrue(calendar.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertIn('DTSTART:20171201T180000Z\r\n', calendar)
+        self.assertIn('DTEND:20171201T200000Z\r\n', calendar)
+        self.assertTrue(calendar.endswith('END:VCALENDAR\r\n'))
@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.core import mail
+from django.core.mail import send_mail, get_connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from coursemanaging.models import OutgoingEmail
+from coursemanaging.outbox import deliver_outbox
+
+
+@override_settings(EMAIL_BACKEND='coursemanaging.outbox.OutboxEmailBackend',
+                   OUTBOX_DELIVERY_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OutboxTest(TestCase):
+    def test_send_mail_is_queued(self):
+        send_mail('subject', 'body', 'from@opengym.be', ['a@opengym.be', 'b@opengym.be'])
+        self.assertEquals(len(mail.outbox), 0)
+        outgoing_email = OutgoingEmail.objects.get()
+        self.assertEquals(outgoing_email.to, 'a@opengym.be\nb@opengym.be')
+        self.assertIsNone(outgoing_email.sent)
+
+    def test_deliver(self):
+        send_mail('subject', 'body', 'from@opengym.be', ['a@opengym.be'], html_message='<p>body</p>')
+        self.assertEquals(deliver_outbox(), (1, 0))
+        self.assertEquals(len(mail.outbox), 1)
+        self.assertEquals(mail.outbox[0].to, ['a@opengym.be'])
+        self.assertEquals(mail.outbox[0].alternatives, [('<p>body</p>', 'text/html')])
+        self.assertIsNotNone(OutgoingEmail.objects.get().sent)
+        self.assertEquals(deliver_outbox(), (0, 0))
+
+    def test_not_due(self):
+        get_connection().send_messages([mail.EmailMessage('subject', 'body', 'from@opengym.be', ['a@opengym.be'])])
+        OutgoingEmail.objects.update(send_after=timezone.now() + timedelta(minutes=1))
+        self.assertEquals(deliver_outbox(), (0, 0))
+        self.assertEquals(len(mail.outbox), 0)
+
+    def test_attachments_and_headers_kept(self):
+        message = mail.EmailMultiAlternatives('subject', 'body', 'from@opengym.be', ['a@opengym.be'],
+                                              headers={'X-Opengym': 'yes'})
+        message.attach('schedule.ics', 'BEGIN:VCALENDAR', 'text/calendar')
+        message.attach('logo.png', b'\x89PNG', 'image/png')
+        message.attach_alternative('body', 'text/x-markdown')
+        message.send()
+        deliver_outbox()
+        self.assertEquals(mail.outbox[0].extra_headers, {'X-Opengym': 'yes'})
+        self.assertEquals(mail.outbox[0].attachments, [('schedule.ics', 'BEGIN:VCALENDAR', 'text/calendar'),
+                                                       ('logo.png', b'\x89PNG', 'image/png')])
+        self.assertEquals(mail.outbox[0].alternatives, [('body', 'text/x-markdown')])
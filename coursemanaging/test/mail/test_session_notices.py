@@ -0,0 +1,72 @@
+import datetime
+import pytz
+
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from datetime import timedelta
+
+from coursemanaging.models import Course, Session, User, SessionChangeNotice
+from coursemanaging.session_notices import send_session_notices
+
+utc = pytz.UTC
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class SessionNoticesTest(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(course_name="test_course", course_level=1, build_up_sessions=False,
+                                            description="test_description")
+        self.start = timezone.now() + timedelta(days=7)
+        self.session = Session.objects.create(course=self.course, start=self.start, duration=timedelta(hours=2))
+        self.other_session = Session.objects.create(course=self.course, start=self.start + timedelta(days=7),
+                                                    duration=timedelta(hours=2))
+        self.user = User.objects.create(email="john@opengym.be", first_name="john", last_name="doe",
+                                        birthdate=utc.localize(datetime.datetime(2017, 12, 1)))
+        self.session.subscribed_users.add(self.user)
+        self.other_session.subscribed_users.add(self.user)
+        self.later = timezone.now() + timedelta(hours=1)
+
+    def move(self, session, start):
+        old_start = session.start
+        session.start = start
+        session.save()
+        SessionChangeNotice.record(session, SessionChangeNotice.CHANGED, old_start=old_start)
+
+    def test_changes_in_one_mail(self):
+        self.move(self.session, self.start + timedelta(hours=1))
+        self.move(self.session, self.start + timedelta(hours=2))
+        self.other_session.delete()
+        self.assertEquals(send_session_notices(self.later), 1)
+        self.assertEquals(len(mail.outbox), 1)
+        self.assertEquals(mail.outbox[0].to, ["john@opengym.be"])
+        self.assertIn("gaat niet door", mail.outbox[0].body)
+        self.assertEquals(mail.outbox[0].body.count("verplaatst naar"), 1)
+        self.assertEquals(send_session_notices(self.later), 0)
+
+    def test_waits_for_window(self):
+        self.move(self.session, self.start + timedelta(hours=1))
+        self.assertEquals(send_session_notices(), 0)
+        self.assertEquals(len(mail.outbox), 0)
+
+    def test_moved_back_is_not_sent(self):
+        self.move(self.session, self.start + timedelta(hours=1))
+        self.move(self.session, self.start)
+        self.assertEquals(send_session_notices(self.later), 0)
+        self.assertEquals(len(mail.outbox), 0)
+
+    def test_duration_change_is_sent(self):
+        old_duration = self.session.duration
+        self.session.duration = timedelta(hours=3)
+        self.session.save()
+        SessionChangeNotice.record(self.session, SessionChangeNotice.CHANGED, old_duration=old_duration)
+        self.assertEquals(send_session_notices(self.later), 1)
+        self.assertIn("duurt nu 3:00:00", mail.outbox[0].body)
+        self.assertNotIn("verplaatst naar", mail.outbox[0].body)
+
+    def test_change_from_zero_duration_is_sent(self):
+        self.session.duration = timedelta(hours=3)
+        self.session.save()
+        SessionChangeNotice.record(self.session, SessionChangeNotice.CHANGED, old_duration=timedelta())
+        self.assertEquals(send_session_notices(self.later), 1)
+        self.assertIn("duurt nu 3:00:00", mail.outbox[0].body)
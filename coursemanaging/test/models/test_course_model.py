@@ -3,9 +3,11 @@ import pytz
 from django.core.exceptions import ValidationError
 
 from django.test import TestCase
+from django.utils import timezone
 import logging
+from datetime import timedelta
 
-from coursemanaging.models import Course, User
+from coursemanaging.models import Course, Session, User
 
 logger = logging.getLogger(__name__)
 utc = pytz.utc
@@ -42,3 +44,28 @@ class CourseTest(TestCase):
             self.course.subscribe_user(self.user)
         self.assertEqual(error.exception.messages[0],
                          "This course is full")
+
+    def test_subscribe_twice_from_two_instances(self):
+        other_course = Course.objects.get(pk=self.course.pk)
+        self.course.subscribe_user(self.user)
+        other_course.subscribe_user(self.user)
+        course = Course.objects.get(pk=self.course.pk)
+        self.assertEquals(course.student_count, course.students.count())
+
+    def test_with_user_status(self):
+        self.course.teachers.add(self.user)
+        with self.assertNumQueries(1):
+            course = Course.objects.with_user_status(self.user).get(pk=self.course.pk)
+        self.assertEquals(course.user_is_teacher_annotated, True)
+        self.assertEquals(course.user_is_student_annotated, False)
+
+    def test_with_next_session(self):
+        now = timezone.now()
+        Session.objects.create(course=self.course, start=now + timedelta(days=2), duration=timedelta(hours=2))
+        next_session = Session.objects.create(course=self.course, start=now + timedelta(days=1),
+                                              duration=timedelta(hours=1))
+        Session.objects.create(course=self.course, start=now - timedelta(days=1), duration=timedelta(hours=2))
+        with self.assertNumQueries(2):
+            course = Course.objects.with_next_session().get(pk=self.course.pk)
+            self.assertEquals(course.get_next_session().id, next_session.id)
+            self.assertEquals(course.get_next_session().duration, timedelta(hours=1))
@@ -45,3 +45,62 @@ class SessionTest(TestCase):
             self.session.subscribe_user(self.user)
         self.assertEqual(error.exception.messages[0],
                          "This session is full")
+
+    def test_subscriber_count(self):
+        self.session.subscribe_user(self.user)
+        self.session.subscribe_user(self.user)
+        self.assertEquals(self.session.subscriber_count, 1)
+        self.assertEquals(Session.objects.get(pk=self.session.pk).subscriber_count, 1)
+        self.session.unsubscribe_user(self.user)
+        self.assertEquals(Session.objects.get(pk=self.session.pk).subscriber_count, 0)
+
+    def test_subscribe_twice_from_two_instances(self):
+        other_session = Session.objects.get(pk=self.session.pk)
+        self.session.subscribe_user(self.user)
+        other_session.subscribe_user(self.user)
+        session = Session.objects.get(pk=self.session.pk)
+        self.assertEquals(session.subscriber_count, session.subscribed_users.count())
+
+    def test_stale_save_keeps_count(self):
+        stale_session = Session.objects.get(pk=self.session.pk)
+        self.session.subscribe_user(self.user)
+        stale_session.extra_info = "info"
+        stale_session.save()
+        self.assertEquals(Session.objects.get(pk=self.session.pk).subscriber_count, 1)
+
+    def test_reserve_waitlist(self):
+        self.session.max_students_diff_course = True
+        self.session.max_students = 1
+        self.session.save()
+        user_a = User.objects.create(email="jub", first_name="john", last_name="doe",
+                                     birthdate=utc.localize(datetime.datetime(2017, 12, 1)))
+        self.assertEquals(self.session.reserve(self.user), Session.SUBSCRIBED)
+        self.assertEquals(self.session.reserve(user_a), Session.WAITLISTED)
+        self.session.unsubscribe_user(self.user)
+        self.assertEquals(self.session.user_is_subscribed(user_a), True)
+        self.assertEquals(self.session.waitlist_entries.count(), 0)
+        self.assertEquals(self.session.subscriber_count, 1)
+
+    def test_resolved_details(self):
+        self.course.location_short = "zaal"
+        self.course.max_students_session = 5
+        self.course.save()
+        Session.objects.create(course=self.course, start=utc.localize(datetime.datetime(2017, 12, 2)),
+                               duration=timedelta(hours=4), location_diff_course=True, location_short="tuin",
+                               max_students_diff_course=True, max_students=2)
+        with self.assertNumQueries(1):
+            sessions = list(Session.objects.with_resolved_details())
+            self.assertEquals([session.get_location_short() for session in sessions], ["zaal", "tuin"])
+            self.assertEquals([session.get_max_students() for session in sessions], [5, 2])
+
+    def test_extra_info_html(self):
+        self.session.extra_info = "*info*"
+        self.session.save()
+        session = Session.objects.get(pk=self.session.pk)
+        self.assertEquals(session.extra_info_html, "<p><em>info</em></p>")
+        session.extra_info_html = "stored"
+        session.save()
+        self.assertEquals(session.extra_info_rendered(), "stored")
+        session.extra_info = "**info**"
+        session.save()
+        self.assertEquals(Session.objects.get(pk=self.session.pk).extra_info_rendered(), "<p><strong>info</strong></p>")
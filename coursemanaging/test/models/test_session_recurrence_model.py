@@ -0,0 +1,46 @@
+import datetime
+import pytz
+
+from django.test import TestCase
+from datetime import timedelta
+
+from coursemanaging.models import Course, Session, SessionRecurrence
+
+utc = pytz.UTC
+
+
+class SessionRecurrenceTest(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(course_name="test_course", course_level=1, build_up_sessions=False,
+                                            description="test_description")
+        self.recurrence = SessionRecurrence.objects.create(course=self.course,
+                                                           start=utc.localize(datetime.datetime(2017, 12, 1, 18)),
+                                                           until=utc.localize(datetime.datetime(2017, 12, 29, 18)),
+                                                           duration=timedelta(hours=2))
+        self.window_start = utc.localize(datetime.datetime(2017, 11, 1))
+        self.window_end = utc.localize(datetime.datetime(2018, 1, 31))
+
+    def test_occurrences(self):
+        sessions = self.recurrence.build_sessions(self.window_start, self.window_end)
+        self.assertEquals(len(sessions), 5)
+        self.assertEquals(sessions[1].start - sessions[0].start, timedelta(weeks=1))
+        self.assertEquals(Session.objects.count(), 0)
+
+    def test_materialize_once(self):
+        occurrence_start = self.recurrence.build_sessions(self.window_start, self.window_end)[2].occurrence_start
+        session = self.recurrence.materialize(occurrence_start)
+        self.assertEquals(self.recurrence.materialize(occurrence_start).pk, session.pk)
+        self.assertEquals(len(self.recurrence.build_sessions(self.window_start, self.window_end)), 4)
+
+    def test_cancel(self):
+        sessions = self.recurrence.build_sessions(self.window_start, self.window_end)
+        self.recurrence.cancel(sessions[0].occurrence_start)
+        self.recurrence.materialize(sessions[1].occurrence_start).delete()
+        self.assertEquals(len(self.recurrence.build_sessions(self.window_start, self.window_end)), 3)
+        self.assertEquals(Session.objects.count(), 0)
+
+    def test_occurrence_key(self):
+        session = self.recurrence.build_sessions(self.window_start, self.window_end)[0]
+        recurrence, occurrence_start = SessionRecurrence.parse_occurrence_key(session.get_occurrence_key())
+        self.assertEquals(recurrence, self.recurrence)
+        self.assertEquals(occurrence_start, session.occurrence_start)
@@ -0,0 +1,91 @@
+import datetime
+import re
+
+from django.core.cache import cache
+from django.test import Client, TestCase, RequestFactory
+from django.urls import reverse
+
+from coursemanaging.calendar_cache import bump_calendar_version
+from coursemanaging.models import NewsItem, User
+from coursemanaging.page_cache import get_page_cache_key, bump_content_version, CSRF_TOKEN_MARKER
+from coursemanaging.prerender import render_page
+
+
+class PageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get('/')
+
+    def test_key_per_path(self):
+        self.assertEquals(get_page_cache_key(self.request), get_page_cache_key(RequestFactory().get('/')))
+        self.assertNotEqual(get_page_cache_key(self.request), get_page_cache_key(RequestFactory().get('/calendar/')))
+
+    def test_key_ignores_query_string(self):
+        self.assertEquals(get_page_cache_key(self.request), get_page_cache_key(RequestFactory().get('/?x=1')))
+
+    def test_versions_invalidate(self):
+        key = get_page_cache_key(self.request)
+        bump_content_version()
+        content_key = get_page_cache_key(self.request)
+        bump_calendar_version()
+        self.assertNotEqual(key, content_key)
+        self.assertNotEqual(content_key, get_page_cache_key(self.request))
+
+
+
+def page_csrf_token(response):
+    return re.search(r'window\.CSRF_TOKEN = "([^"]*)"', response.content.decode('utf-8')).group(1)
+
+
+class CachedPageTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('coursemanaging:calendar')
+        self.page_cache_key = get_page_cache_key(RequestFactory().get(self.url))
+
+    def test_second_visitor_served_from_cache(self):
+        Client().get(self.url)
+        self.assertIsNotNone(cache.get(self.page_cache_key))
+        client = Client(enforce_csrf_checks=True)
+        with self.assertNumQueries(0):
+            response = client.get(self.url)
+        token = page_csrf_token(response)
+        self.assertNotEqual(token, CSRF_TOKEN_MARKER)
+        # the calendar page does not accept posts, passing the csrf check ends in 405 instead of 403
+        self.assertEquals(client.post(self.url, HTTP_X_CSRFTOKEN=token).status_code, 405)
+
+    def test_query_string_not_cached(self):
+        response = Client().get(self.url + '?x=1')
+        self.assertNotEqual(page_csrf_token(response), CSRF_TOKEN_MARKER)
+        self.assertIsNone(cache.get(self.page_cache_key))
+
+    def test_logged_in_not_cached(self):
+        client = Client()
+        client.force_login(User.objects.create(email="john", first_name="john", last_name="doe",
+                                               birthdate=datetime.date(2017, 12, 1)))
+        response = client.get(self.url)
+        self.assertNotEqual(page_csrf_token(response), CSRF_TOKEN_MARKER)
+        self.assertIsNone(cache.get(self.page_cache_key))
+
+
+class PrerenderCsrfTest(TestCase):
+    def test_marker_instead_of_token(self):
+        content = render_page(reverse('coursemanaging:news')).decode('utf-8')
+        self.assertIn('window.CSRF_TOKEN = "%s"' % CSRF_TOKEN_MARKER, content)
+
+    def test_fetched_token_accepted(self):
+        news_item = NewsItem.objects.create(text="longtext", short_text="short_text", title="title")
+        client = Client(enforce_csrf_checks=True)
+        token = client.get(reverse('coursemanaging:csrf-token')).json()['token']
+        response = client.post(reverse('coursemanaging:news'), {'news_item_id': news_item.id},
+                               HTTP_X_REQUESTED_WITH='XMLHttpRequest', HTTP_X_CSRFTOKEN=token)
+        self.assertEquals(response.status_code, 200)
+
+    def test_cached_page_token_not_shared(self):
+        cache.clear()
+        url = reverse('coursemanaging:calendar')
+        first_client = Client(enforce_csrf_checks=True)
+        first_token = page_csrf_token(first_client.get(url))
+        second_token = page_csrf_token(Client(enforce_csrf_checks=True).get(url))
+        self.assertEquals(first_client.post(url, HTTP_X_CSRFTOKEN=second_token).status_code, 403)
+        self.assertEquals(first_client.post(url, HTTP_X_CSRFTOKEN=first_token).status_code, 405)
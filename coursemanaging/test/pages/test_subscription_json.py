@@ -0,0 +1,46 @@
+import datetime
+import pytz
+
+from django.test import TestCase
+from django.urls import reverse
+from datetime import timedelta
+
+from coursemanaging.models import Course, Session, User
+
+utc = pytz.UTC
+
+
+class SubscriptionJsonTest(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(course_name="test_course", course_level=1, build_up_sessions=False,
+                                            description="test_description")
+        self.session = Session.objects.create(course=self.course,
+                                              start=utc.localize(datetime.datetime(2017, 12, 1)),
+                                              duration=timedelta(hours=4))
+        self.user = User.objects.create(email="john", first_name="john", last_name="doe",
+                                        birthdate=utc.localize(datetime.datetime(2017, 12, 1)))
+        self.client.force_login(self.user)
+
+    def test_join_session(self):
+        response = self.client.post(reverse('coursemanaging:course-subscription', args=[self.course.id]),
+                                    {'join_session': self.session.id})
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.json()['session']['id'], self.session.id)
+
+    def test_unknown_session(self):
+        response = self.client.post(reverse('coursemanaging:course-subscription', args=[self.course.id]),
+                                    {'join_session': self.session.id + 1})
+        self.assertEquals(response.status_code, 404)
+        self.assertIn('error', response.json())
+
+    def test_invalid_session_id(self):
+        response = self.client.post(reverse('coursemanaging:course-subscription', args=[self.course.id]),
+                                    {'join_session': 'abc'})
+        self.assertEquals(response.status_code, 404)
+        self.assertIn('error', response.json())
+
+    def test_unknown_course(self):
+        response = self.client.post(reverse('coursemanaging:course-subscription', args=[self.course.id + 1]),
+                                    {'join_course': 'true'})
+        self.assertEquals(response.status_code, 404)
+        self.assertIn('error', response.json())
@@ -0,0 +1,58 @@
+import datetime
+import pytz
+
+from django.test import TestCase, override_settings
+from datetime import timedelta
+
+from coursemanaging.models import Course, Session
+from coursemanaging.schedule_import import import_schedule
+
+utc = pytz.UTC
+
+
+class ScheduleImportTest(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(course_name="test_course", course_level=1, build_up_sessions=False,
+                                            description="test_description", max_students_session=8)
+
+    def test_csv(self):
+        rows = ['course,start,duration,max_students,location_short']
+        for day in range(1, 29):
+            rows.append('test_course,2017-12-%02dT18:00:00+00:00,2:00:00,,' % day)
+        rows.append('%d,2018-01-01T18:00:00+00:00,1:30:00,4,zaal' % self.course.id)
+        schedule_import = import_schedule('\n'.join(rows))
+        self.assertEquals(schedule_import.errors, [])
+        self.assertEquals(schedule_import.created, 29)
+        last_session = Session.objects.get(start=utc.localize(datetime.datetime(2018, 1, 1, 18)))
+        self.assertEquals(last_session.duration, timedelta(hours=1, minutes=30))
+        self.assertEquals(last_session.max_students, 4)
+        self.assertEquals(last_session.location_short, 'zaal')
+        self.assertEquals(Session.objects.filter(max_students=8).count(), 28)
+
+    def test_errors_import_nothing(self):
+        schedule_import = import_schedule('course,start,duration\n'
+                                          'test_course,2017-12-01T18:00:00+00:00,2:00:00\n'
+                                          'other_course,2017-12-02T18:00:00+00:00,2:00:00\n'
+                                          'test_course,tomorrow,2:00:00\n')
+        self.assertEquals([line for line, message in schedule_import.errors], [3, 4])
+        self.assertEquals(Session.objects.count(), 0)
+
+    def test_ics(self):
+        schedule_import = import_schedule('BEGIN:VCALENDAR\r\n'
+                                          'BEGIN:VEVENT\r\n'
+                                          'DTSTART:20171201T180000Z\r\n'
+                                          'DTEND:20171201T200000Z\r\n'
+                                          'SUMMARY:test_course\r\n'
+                                          'END:VEVENT\r\n'
+                                          'END:VCALENDAR\r\n', format='ics')
+        self.assertEquals(schedule_import.errors, [])
+        self.assertEquals(Session.objects.get().duration, timedelta(hours=2))
+
+    @override_settings(TIME_ZONE='Europe/Brussels')
+    def test_dst_gap_is_invalid_time(self):
+        schedule_import = import_schedule('course,start,duration\ntest_course,2026-03-29 02:30,2:00:00\n')
+        self.assertEquals(schedule_import.errors, [(2, "Ongeldig tijdstip")])
+        schedule_import = import_schedule('BEGIN:VCALENDAR\r\nBEGIN:VEVENT\r\nSUMMARY:test_course\r\n'
+                                          'DTSTART;TZID=Nowhere/Town:20261201T180000\r\nDURATION:PT2H\r\n'
+                                          'END:VEVENT\r\nEND:VCALENDAR\r\n', format='ics')
+        self.assertEquals(schedule_import.errors, [(2, "Ongeldig tijdstip")])
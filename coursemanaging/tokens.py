@@ -1,4 +1,6 @@
+from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.core.signing import Signer, BadSignature
 from django.utils import six
 
 
@@ -11,3 +13,37 @@ class AccountActivationTokenGenerator(PasswordResetTokenGenerator):
 
 
 account_activation_token = AccountActivationTokenGenerator()
+
+
+class CalendarFeedTokenGenerator(object):
+    """
+    Signs the id of a user, so the personal calendar feed can be polled by calendar apps without a session. The
+    calendar feed key of the user is part of the salt, so resetting the key revokes the urls handed out before.
+    """
+    salt = 'coursemanaging.tokens.CalendarFeedTokenGenerator'
+
+    def _signer(self, user):
+        return Signer(salt='%s:%s' % (self.salt, user.calendar_feed_key))
+
+    def make_token(self, user):
+        return self._signer(user).sign(six.text_type(user.pk))
+
+    def get_user(self, token):
+        """
+        The active user the token was made for, or None when it is malformed or revoked.
+        """
+        try:
+            user_id = int(token.split(':', 1)[0])
+        except ValueError:
+            return None
+        user = get_user_model().objects.filter(pk=user_id, is_active=True).first()
+        if user is None:
+            return None
+        try:
+            self._signer(user).unsign(token)
+        except BadSignature:
+            return None
+        return user
+
+
+calendar_feed_token = CalendarFeedTokenGenerator()
@@ -12,6 +12,10 @@ urlpatterns = [
         name='course-create'),
     url(r'^course/(?P<pk>[0-9]+)/$', views.CourseDetailView.as_view(),
         name='course-detail'),
+    url(r'^course/(?P<pk>[0-9]+)/past-sessions$', views.get_past_sessions,
+        name='course-past-sessions'),
+    url(r'^course/(?P<pk>[0-9]+)/subscription$', views.change_subscription_json,
+        name='course-subscription'),
     url(r'^activities/$', views.Activities.as_view(),
         name='activities'),
     url(r'^course/update/(?P<pk>[0-9]+)/$', login_required(views.CourseUpdateView.as_view()),
@@ -24,6 +28,9 @@ urlpatterns = [
         name='session-user-list'),
     url(r'^session/(?P<pk>[0-9]+)/session-update$', login_required(views.SessionUpdateView.as_view()),
         name='session-update'),
+    url(r'^occurrence/(?P<key>[0-9]+-[0-9]+)/update$', views.update_occurrence, name='occurrence-update'),
+    url(r'^schedule-import$', login_required(views.ScheduleImportView.as_view()),
+        name='schedule-import'),
     url(r'^event/create$', login_required(views.EventCreateview.as_view()),
         name='event-create'),
     url(r'^event/(?P<pk>[0-9]+)/update$', login_required(views.EventUpdateView.as_view()),
@@ -44,6 +51,8 @@ urlpatterns = [
         name='user-register'),
     url(r'^user/$', login_required(views.UserDetailView.as_view()),
         name='user-detail'),
+    url(r'^user/reset-calendar-feed/$', views.reset_calendar_feed,
+        name='user-reset-calendar-feed'),
     url(r'^activate/(?P<uidb64>[0-9A-Za-z_\-]+)/(?P<token>[0-9A-Za-z]{1,13}-[0-9A-Za-z]{1,20})/$', views.activate,
         name='user-activate'),
     url(r'^login/$', auth_views.login, {'template_name': 'coursemanaging/user-login.html'},
@@ -58,6 +67,8 @@ urlpatterns = [
         name='news'),
     url(r'^blog/(?P<pk>[0-9]+)$', views.NewsView.as_view(),
         name='news'),
+    url(r'^csrf-token/$', views.get_csrf_token,
+        name='csrf-token'),
     url(r'^impossible/$', views.ImpossibleView.as_view(),
         name='impossible'),
     url(r'^thanks/$', views.ThanksView.as_view(),
@@ -67,4 +78,10 @@ urlpatterns = [
         name='ajax-calendar'),
     url(r'^ajax-week-calendar/$', views.get_week_calendar,
         name='ajax-calendar'),
+    url(r'^ajax-calendar-entries/$', views.get_calendar_entries,
+        name='ajax-calendar-entries'),
+    url(r'^calendar\.ics$', views.get_public_ical_feed,
+        name='ical-public'),
+    url(r'^calendar-feed/(?P<token>[0-9]+:[0-9A-Za-z_\-]+)\.ics$', views.get_user_ical_feed,
+        name='ical-user'),
 ]
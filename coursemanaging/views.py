@@ -1,77 +1,67 @@
-import calendar
 import datetime
 from datetime import timedelta
+from itertools import chain
 
-import pytz
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import UserPassesTestMixin
-from django.core.exceptions import PermissionDenied
+from django.core.exceptions import PermissionDenied, ValidationError
 from django.core.mail import EmailMessage
-from django.http import HttpResponseRedirect
+from django.db.models import Q
+from django.http import Http404, HttpResponseRedirect, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
 from django.shortcuts import redirect, render, get_object_or_404, render_to_response
 from django.urls import reverse_lazy
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils.decorators import method_decorator
 from django.utils.encoding import force_text
 from django.utils.http import urlsafe_base64_decode
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext as _
 from django.views import generic
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import condition, require_POST
 
+from coursemanaging.calendar_cache import get_calendar_html, get_calendar_version, get_calendar_last_modified, \
+    get_user_schedule_version
+from coursemanaging.calendar_data import CalendarWindow, load_calendar_entries
 from coursemanaging.forms import UserRegisterForm, CourseCreateForm, SessionCreateForm, ContactForm, EventCreateForm, \
-    BuildingDayCreateForm
-from coursemanaging.open_calendar import OpenCalendar
-from coursemanaging.tokens import account_activation_token
+    BuildingDayCreateForm, ScheduleImportForm
+from coursemanaging.ical import format_event, iter_calendar
+from coursemanaging.open_calendar import CalendarMembership
+from coursemanaging.page_cache import AnonymousPageCacheMixin, CsrfTokenMarkerMixin
+from coursemanaging.schedule_import import import_schedule, guess_format
+from coursemanaging.tokens import account_activation_token, calendar_feed_token
 from mostaardimgur.models import ImgurAlbum
-from .models import Course, Session, User, NewsBulletin, NewsItem, Event, BuildingDay
+from .models import Course, Session, User, NewsBulletin, NewsItem, Event, BuildingDay, SessionWaitlistEntry, \
+    SessionRecurrence, SessionChangeNotice
 
-utc = pytz.UTC
+MAX_CALENDAR_ENTRIES_DAYS = 93
+PAST_SESSIONS_PAGE_SIZE = 20
+SUBSCRIPTION_ACTIONS = ('join_course', 'leave_course', 'join_session', 'leave_session', 'leave_waitlist')
+ICAL_FEED_HISTORY_DAYS = 90
 
 
-class LandingView(generic.TemplateView):
+class LandingView(AnonymousPageCacheMixin, generic.TemplateView):
     """home page of the opengym platform"""
     template_name = 'opengym/landing.html'
 
     def get_context_data(self, **kwargs):
         context = super(LandingView, self).get_context_data(**kwargs)
-        today = timezone.now()
-        monthrange = calendar.monthrange(today.year, today.month)
-        """ month calendar """
-        start_calendar_period = utc.localize(datetime.datetime(today.year, today.month, 1))
-        end_calendar_period = utc.localize(
-            datetime.datetime(today.year, today.month, monthrange[1], hour=23, minute=59, second=59))
-
-        sessions = Session.objects.filter(start__lte=end_calendar_period,
-                                          start__gte=start_calendar_period, course__is_active=True)
-        events = Event.objects.filter(start__lte=end_calendar_period,
-                                      start__gte=start_calendar_period)
-        building_days = BuildingDay.objects.filter(start__lte=end_calendar_period,
-                                                   start__gte=start_calendar_period)
-        """ week calendar """
-        start_week = today - timedelta(days=today.weekday())
-        start_week = start_week.replace(hour=0, minute=0)
-        end_week = today + timedelta(days=7)
-        end_week = end_week.replace(hour=23, minute=59)
-        week_sessions = Session.objects.filter(start__lte=end_week,
-                                               start__gte=start_week, course__is_active=True)
-        week_events = Event.objects.filter(start__lte=end_week,
-                                           start__gte=start_week)
-        week_building_days = BuildingDay.objects.filter(start__lte=end_week,
-                                                        start__gte=start_week)
-
-        calendar_month = OpenCalendar(sessions, events, building_days, self.request.user) \
-            .formatmonth(today.year, today.month)
-        calendar_week = OpenCalendar(week_sessions, week_events, week_building_days, self.request.user) \
-            .bootstrap_week(today.year, today.month, today.day)
-
-        bulletins = NewsBulletin.objects.all().order_by('bulletin_level')
+        today = timezone.localdate()
+        calendar_month, calendar_week = get_calendar_html(CalendarMembership.for_user(self.request.user),
+                                                          month=(today.year, today.month), week=today)
+
+        # only evaluated when the fragments using them are not cached
+        bulletins = NewsBulletin.objects.select_related('news_item').order_by('bulletin_level')
         context['calendar'] = mark_safe(calendar_month)
         context['calendar_week'] = mark_safe(calendar_week)
         context['bulletins'] = bulletins
         context['contact_form'] = ContactForm()
 
-        albums = ImgurAlbum.objects.filter(is_favourite=True).all()
+        albums = ImgurAlbum.objects.filter(is_favourite=True).select_related('cover_image')
         context['albums'] = albums
 
         return context
@@ -104,7 +94,7 @@ class LandingView(generic.TemplateView):
             return HttpResponseRedirect('/thanks/')
 
 
-class NewsView(generic.TemplateView):
+class NewsView(CsrfTokenMarkerMixin, generic.TemplateView):
     template_name = 'coursemanaging/news.html'
 
     def get_context_data(self, **kwargs):
@@ -125,6 +115,14 @@ class NewsView(generic.TemplateView):
             return render_to_response('coursemanaging/news-item.html', {'news_item': news_item})
 
 
+@never_cache
+def get_csrf_token(request):
+    """
+    A csrf token for the forms of a pre-rendered page, the response also sets the csrf cookie.
+    """
+    return JsonResponse({'token': get_token(request)})
+
+
 """
 USER VIEWS
 """
@@ -146,6 +144,22 @@ class RegisterView(generic.CreateView):
 class UserDetailView(generic.TemplateView):
     template_name = 'coursemanaging/user-detail.html'
 
+    def get_context_data(self, **kwargs):
+        context = super(UserDetailView, self).get_context_data(**kwargs)
+        context['calendar_feed_url'] = self.request.build_absolute_uri(
+            reverse_lazy('coursemanaging:ical-user', args=[calendar_feed_token.make_token(self.request.user)]))
+        return context
+
+
+@login_required
+@require_POST
+def reset_calendar_feed(request):
+    """
+    Gives the user a new calendar feed url, the old one stops working.
+    """
+    request.user.reset_calendar_feed_key()
+    return redirect('coursemanaging:user-detail')
+
 
 class AccountActivationSentView(generic.TemplateView):
     template_name = 'coursemanaging/account-activation-sent.html'
@@ -207,46 +221,34 @@ class CourseDetailView(generic.DetailView):
     template_name = 'coursemanaging/course-detail.html'
     model = Course
 
+    def get_queryset(self):
+        return Course.objects.with_user_status(self.request.user)
+
     def get_context_data(self, **kwargs):
         context = super(CourseDetailView, self).get_context_data(**kwargs)
-        context['is_teacher'] = self.object.teachers.filter(pk=self.request.user.id).exists()
-        context['is_student'] = self.object.students.filter(pk=self.request.user.id).exists()
-        sessions_subscribed = dict()
-        for session in self.object.sessions.all():
-            sessions_subscribed[session.id] = session.subscribed_users.filter(id=self.request.user.id).exists()
-        context['sessions_subscribed'] = sessions_subscribed
+        context['is_teacher'] = self.object.user_is_teacher_annotated
+        context['is_student'] = self.object.user_is_student_annotated
+        context['sessions_subscribed'] = set(
+            Session.subscribed_users.through.objects.filter(user_id=self.request.user.id,
+                                                            session__course=self.object)
+                .values_list('session_id', flat=True))
+        context['sessions_waitlisted'] = set(
+            SessionWaitlistEntry.objects.filter(user_id=self.request.user.id, session__course=self.object)
+                .values_list('session_id', flat=True))
+        context['has_past_sessions'] = self.object.sessions.filter(start__lt=timezone.now()).exists()
         return context
 
     def post(self, request, *args, **kwargs):
-        join_session = request.POST.get("join_session")
-        leave_session = request.POST.get("leave_session")
-        join_course = request.POST.get("join_course")
-        leave_course = request.POST.get("leave_course")
         remove_session = request.POST.get("remove_session")
+        join_occurrence = request.POST.get("join_occurrence")
+        remove_occurrence = request.POST.get("remove_occurrence")
         course = get_object_or_404(Course, pk=self.kwargs['pk'])
 
-        if join_course:
-            if course.students.filter(pk=request.user.id).exists():
-                return redirect('coursemanaging:impossible')
-            course.students.add(self.request.user)
-            return redirect('coursemanaging:course-detail', pk=course.id)
-        if leave_course:
-            if not course.students.filter(pk=request.user.id).exists():
-                return redirect('coursemanaging:impossible')
-            course.students.remove(self.request.user)
-            return redirect('coursemanaging:course-detail', pk=course.id)
-        if join_session:
-            session = get_object_or_404(Session, pk=join_session)
-            if session.subscribed_users.filter(pk=request.user.id).exists():
-                return redirect('coursemanaging:impossible')
-            if request.user not in session.subscribed_users.all():
-                session.subscribe_user(self.request.user)
-            return redirect('coursemanaging:course-detail', pk=course.id)
-        if leave_session:
-            session = get_object_or_404(Session, pk=leave_session)
-            if not session.subscribed_users.filter(pk=request.user.id).exists():
+        if any(request.POST.get(action) for action in SUBSCRIPTION_ACTIONS):
+            try:
+                change_subscription(request, course)
+            except ValidationError:
                 return redirect('coursemanaging:impossible')
-            session.unsubscribe_user(self.request.user)
             return redirect('coursemanaging:course-detail', pk=course.id)
         if remove_session:
             if course.teachers.filter(pk=self.request.user.id).exists():
@@ -254,6 +256,115 @@ class CourseDetailView(generic.DetailView):
                 return redirect('coursemanaging:course-detail', pk=course.id)
             else:
                 return redirect('coursemanaging:impossible')
+        if join_occurrence:
+            try:
+                recurrence, occurrence_start = SessionRecurrence.parse_occurrence_key(join_occurrence)
+                if recurrence.course_id != course.id:
+                    return redirect('coursemanaging:impossible')
+                recurrence.materialize(occurrence_start).reserve(self.request.user)
+            except ValidationError:
+                return redirect('coursemanaging:impossible')
+            return redirect('coursemanaging:course-detail', pk=course.id)
+        if remove_occurrence:
+            if not course.teachers.filter(pk=self.request.user.id).exists():
+                return redirect('coursemanaging:impossible')
+            try:
+                recurrence, occurrence_start = SessionRecurrence.parse_occurrence_key(remove_occurrence)
+            except ValidationError:
+                return redirect('coursemanaging:impossible')
+            if recurrence.course_id != course.id:
+                return redirect('coursemanaging:impossible')
+            recurrence.cancel(occurrence_start)
+            return redirect('coursemanaging:course-detail', pk=course.id)
+
+
+def change_subscription(request, course):
+    """
+    Applies the join or leave action in the POST data to the course or one of its sessions, and returns the changed
+    session (None for the course) and the new state of the user, Session.SUBSCRIBED, Session.WAITLISTED or None.
+    Raises a ValidationError when the action is not possible.
+    """
+    if request.POST.get('join_course'):
+        if course.students.filter(pk=request.user.id).exists():
+            raise ValidationError("User already in course", code='invalid')
+        course.subscribe_user(request.user)
+        return None, Session.SUBSCRIBED
+    if request.POST.get('leave_course'):
+        course.unsubscribe_user(request.user)
+        return None, None
+    if request.POST.get('join_session'):
+        session = get_object_or_404(Session, pk=request.POST['join_session'], course=course)
+        if session.subscribed_users.filter(pk=request.user.id).exists():
+            raise ValidationError("User already in session", code='invalid')
+        return session, session.reserve(request.user)
+    if request.POST.get('leave_waitlist'):
+        session = get_object_or_404(Session, pk=request.POST['leave_waitlist'], course=course)
+        session.leave_waitlist(request.user)
+        return session, None
+    if request.POST.get('leave_session'):
+        session = get_object_or_404(Session, pk=request.POST['leave_session'], course=course)
+        session.unsubscribe_user(request.user)
+        return session, None
+    raise ValidationError("Unknown action", code='invalid')
+
+
+def _places_left(max_students, count):
+    if not max_students:
+        return None
+    return max(max_students - count, 0)
+
+
+@require_POST
+def change_subscription_json(request, pk):
+    """
+    The join and leave actions of the course detail page, answering with the new state and the places left instead
+    of rendering the page again.
+    """
+    if not request.user.is_authenticated():
+        return JsonResponse({'error': _('Login to subscribe')}, status=403)
+    try:
+        course = get_object_or_404(Course, pk=pk)
+        session, state = change_subscription(request, course)
+    except (Http404, ValueError):
+        return JsonResponse({'error': _('Not found')}, status=404)
+    except ValidationError as error:
+        return JsonResponse({'error': error.messages[0]}, status=409)
+    result = {'state': state}
+    if session is None:
+        result['course'] = {'id': course.id, 'student_count': course.student_count,
+                            'places_left': _places_left(course.max_students_course, course.student_count)}
+    else:
+        result['session'] = {'id': session.id, 'subscriber_count': session.subscriber_count,
+                             'places_left': _places_left(session.get_max_students(), session.subscriber_count)}
+    return JsonResponse(result)
+
+
+def get_past_sessions(request, pk):
+    """
+    The past sessions of a course, newest first, a page at a time. The page continues after the (start, id) of the
+    last session shown, so every page costs the same however old the course is.
+    """
+    course = get_object_or_404(Course.objects.with_user_status(request.user), pk=pk)
+    sessions = course.sessions.filter(start__lt=timezone.now()).with_resolved_details()
+    try:
+        before = parse_datetime(request.GET.get('before', ''))
+    except ValueError:
+        return HttpResponseBadRequest()
+    if before is not None:
+        try:
+            before_id = int(request.GET.get('before_id', ''))
+        except ValueError:
+            return HttpResponseBadRequest()
+        sessions = sessions.filter(Q(start__lt=before) | Q(start=before, id__lt=before_id))
+    sessions = list(sessions.order_by('-start', '-id')[:PAST_SESSIONS_PAGE_SIZE + 1])
+    has_more = len(sessions) > PAST_SESSIONS_PAGE_SIZE
+    sessions = sessions[:PAST_SESSIONS_PAGE_SIZE]
+    sessions_subscribed = set(
+        Session.subscribed_users.through.objects.filter(user_id=request.user.id, session__in=sessions)
+            .values_list('session_id', flat=True))
+    return render(request, 'coursemanaging/course-past-sessions.html',
+                  {'course': course, 'sessions': sessions, 'has_more': has_more,
+                   'is_teacher': course.user_is_teacher_annotated, 'sessions_subscribed': sessions_subscribed})
 
 
 class Activities(generic.TemplateView):
@@ -262,7 +373,7 @@ class Activities(generic.TemplateView):
     def get_context_data(self, **kwargs):
         context = super(Activities, self).get_context_data(**kwargs)
         context['current_page'] = 'courses'
-        context['courses'] = Course.objects.filter(is_active=True)
+        context['courses'] = Course.objects.filter(is_active=True).with_next_session()
         context['events'] = Event.objects.filter(start__gte=timezone.now()).order_by('start')
         context['building_days'] = BuildingDay.objects.filter(start__gte=timezone.now()).order_by('start')
 
@@ -294,11 +405,12 @@ class CoursesUserListView(generic.ListView):
 
     def get_context_data(self, **kwargs):
         context = super(CoursesUserListView, self).get_context_data(**kwargs)
-        context['courses_student'] = Course.objects.filter(students=self.request.user, is_active=True)
+        context['courses_student'] = Course.objects.filter(students=self.request.user, is_active=True) \
+            .with_next_session()
         return context
 
     def get_queryset(self):
-        return Course.objects.filter(teachers=self.request.user, is_active=True)
+        return Course.objects.filter(teachers=self.request.user, is_active=True).with_next_session()
 
 
 """
@@ -334,7 +446,7 @@ class SessionCreateView(UserPassesTestMixin, generic.CreateView):
 
 class SessionUserListView(UserPassesTestMixin, generic.DetailView):
     template_name = 'coursemanaging/session-user-list.html'
-    model = Session
+    queryset = Session.objects.with_resolved_details()
 
     def test_func(self):
         course = self.get_object().course
@@ -361,10 +473,36 @@ class SessionUpdateView(UserPassesTestMixin, generic.UpdateView):
             raise PermissionDenied(self.get_permission_denied_message())
         return redirect('coursemanaging:impossible')
 
+    def form_valid(self, form):
+        response = super(SessionUpdateView, self).form_valid(form)
+        if 'start' in form.changed_data or 'duration' in form.changed_data:
+            SessionChangeNotice.record(self.object, SessionChangeNotice.CHANGED, old_start=form.initial['start'],
+                                       old_duration=form.initial['duration'])
+        self.object.promote_waitlist()
+        return response
+
     def get_success_url(self):
         return reverse_lazy('coursemanaging:course-detail', kwargs={'pk': self.object.course.id})
 
 
+@login_required
+def update_occurrence(request, key):
+    """
+    Creates the session of an occurrence of a recurrence so the teacher can edit it like any other session.
+    """
+    try:
+        recurrence, occurrence_start = SessionRecurrence.parse_occurrence_key(key)
+    except ValidationError:
+        return redirect('coursemanaging:impossible')
+    if not (request.user.teacher and recurrence.course.teachers.filter(pk=request.user.id).exists()):
+        return redirect('coursemanaging:impossible')
+    try:
+        session = recurrence.materialize(occurrence_start)
+    except ValidationError:
+        return redirect('coursemanaging:impossible')
+    return redirect('coursemanaging:session-update', pk=session.id)
+
+
 '''
 
 EVENT VIEWS
@@ -372,6 +510,27 @@ EVENT VIEWS
 '''
 
 
+class ScheduleImportView(UserPassesTestMixin, generic.FormView):
+    """Imports the sessions of many courses at once, the errors are shown per row"""
+    template_name = 'coursemanaging/schedule-import.html'
+    form_class = ScheduleImportForm
+    permission_denied_message = _('Only staff can import schedules')
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def handle_no_permission(self):
+        if self.raise_exception:
+            raise PermissionDenied(self.get_permission_denied_message())
+        return redirect('coursemanaging:impossible')
+
+    def form_valid(self, form):
+        schedule = form.cleaned_data['schedule']
+        schedule_import = import_schedule(form.cleaned_data['schedule_text'], guess_format(schedule.name),
+                                          dry_run=form.cleaned_data['dry_run'])
+        return self.render_to_response(self.get_context_data(form=form, schedule_import=schedule_import))
+
+
 class EventCreateview(UserPassesTestMixin, generic.CreateView):
     template_name = 'coursemanaging/event-create.html'
     model = Event
@@ -506,40 +665,14 @@ class BuildingDayDetailView(generic.DetailView):
             return redirect('coursemanaging:building-day-detail', pk=building_day.id)
 
 
-class CalendarView(generic.TemplateView):
+class CalendarView(AnonymousPageCacheMixin, generic.TemplateView):
     template_name = 'coursemanaging/calendar.html'
 
     def get_context_data(self, **kwargs):
         context = super(CalendarView, self).get_context_data(**kwargs)
-        today = datetime.datetime.today()
-        monthrange = calendar.monthrange(today.year, today.month)
-        """ month calendar """
-        start_calendar_period = utc.localize(datetime.datetime(today.year, today.month, 1))
-        end_calendar_period = utc.localize(
-            datetime.datetime(today.year, today.month, monthrange[1], hour=23, minute=59, second=59))
-
-        sessions = Session.objects.filter(start__lte=end_calendar_period,
-                                          start__gte=start_calendar_period, course__is_active=True)
-        events = Event.objects.filter(start__lte=end_calendar_period,
-                                      start__gte=start_calendar_period)
-        building_days = BuildingDay.objects.filter(start__lte=end_calendar_period,
-                                                   start__gte=start_calendar_period)
-        """ week calendar """
-        start_week = today - timedelta(days=today.weekday())
-        start_week = start_week.replace(hour=0, minute=0)
-        end_week = today + timedelta(days=7)
-        end_week = end_week.replace(hour=23, minute=59)
-        week_sessions = Session.objects.filter(start__lte=end_week,
-                                               start__gte=start_week, course__is_active=True)
-        week_events = Event.objects.filter(start__lte=end_week,
-                                           start__gte=start_week)
-        week_building_days = BuildingDay.objects.filter(start__lte=end_week,
-                                                        start__gte=start_week)
-
-        calendar_month = OpenCalendar(sessions, events, building_days, self.request.user) \
-            .formatmonth(today.year, today.month)
-        calendar_week = OpenCalendar(week_sessions, week_events, week_building_days, self.request.user) \
-            .bootstrap_week(today.year, today.month, today.day)
+        today = timezone.localdate()
+        calendar_month, calendar_week = get_calendar_html(CalendarMembership.for_user(self.request.user),
+                                                          month=(today.year, today.month), week=today)
 
         context['current_page'] = 'calendar'
         context['calendar'] = mark_safe(calendar_month)
@@ -551,18 +684,8 @@ def get_calendar(request):
     if request.is_ajax():
         month = int(request.GET.get('month'))
         year = int(request.GET.get('year'))
-        monthrange = calendar.monthrange(year, month)
-        start_calendar_period = utc.localize(datetime.datetime(year, month, 1))
-        end_calendar_period = utc.localize(datetime.datetime(year, month, monthrange[1], hour=23, minute=59, second=59))
 
-        sessions = Session.objects.filter(start__lte=end_calendar_period,
-                                          start__gte=start_calendar_period, course__is_active=True)
-        events = Event.objects.filter(start__lte=end_calendar_period,
-                                      start__gte=start_calendar_period)
-        building_days = BuildingDay.objects.filter(start__lte=end_calendar_period,
-                                                   start__gte=start_calendar_period)
-
-        cal = OpenCalendar(sessions, events, building_days, request.user).formatmonth(year, month)
+        cal = get_calendar_html(CalendarMembership.for_user(request.user), month=(year, month))[0]
 
         return render_to_response('coursemanaging/calendar-ajax.html', {'calendar': mark_safe(cal)})
 
@@ -572,26 +695,132 @@ def get_week_calendar(request):
         month = int(request.GET.get('month'))
         year = int(request.GET.get('year'))
         day = int(request.GET.get('day'))
-        date = timezone.now()
-        date = date.replace(year=year, day=day, month=month)
-
-        start_week = date - timedelta(days=date.weekday())
-        start_week = start_week.replace(hour=0, minute=0)
-        end_week = date + timedelta(days=7)
-        end_week = end_week.replace(hour=23, minute=59)
-        week_sessions = Session.objects.filter(start__lte=end_week,
-                                               start__gte=start_week, course__is_active=True)
-        week_events = Event.objects.filter(start__lte=end_week,
-                                           start__gte=start_week)
-        week_building_days = BuildingDay.objects.filter(start__lte=end_week,
-                                                        start__gte=start_week)
-
-        calendar_week = OpenCalendar(week_sessions, week_events, week_building_days, request.user) \
-            .bootstrap_week(date.year, date.month, date.day)
+
+        calendar_week = get_calendar_html(CalendarMembership.for_user(request.user),
+                                          week=datetime.date(year, month, day))[1]
 
         return render_to_response('coursemanaging/calendar-ajax.html', {'calendar': mark_safe(calendar_week)})
 
 
+def _get_entries_window(request):
+    first_day = parse_date(request.GET.get('start', ''))
+    last_day = parse_date(request.GET.get('end', ''))
+    if first_day is None or last_day is None or not 0 <= (last_day - first_day).days <= MAX_CALENDAR_ENTRIES_DAYS:
+        return None
+    return CalendarWindow.for_dates(first_day, last_day)
+
+
+def _calendar_entries_etag(request):
+    window = _get_entries_window(request)
+    if window is None:
+        return None
+    return '"%s-%s-%s"' % (get_calendar_version(), window.start.date().isoformat(), window.end.date().isoformat())
+
+
+def _calendar_entries_last_modified(request):
+    if _get_entries_window(request) is None:
+        return None
+    return get_calendar_last_modified()
+
+
+@condition(etag_func=_calendar_entries_etag, last_modified_func=_calendar_entries_last_modified)
+def get_calendar_entries(request):
+    """
+    The calendar entries between the start and end date (inclusive) as json, shared by all users. Repeated requests
+    are answered with 304 Not Modified as long as the calendar did not change.
+    """
+    window = _get_entries_window(request)
+    if window is None:
+        return HttpResponseBadRequest('start and end must be dates at most %d days apart' % MAX_CALENDAR_ENTRIES_DAYS)
+    response = JsonResponse(load_calendar_entries(window).as_dict())
+    patch_cache_control(response, public=True, max_age=0)
+    return response
+
+
+'''
+
+CALENDAR FEEDS
+
+'''
+
+
+def _public_feed_etag(request):
+    return '"public-%s"' % get_calendar_version()
+
+
+def _user_feed_etag(request, token):
+    user = calendar_feed_token.get_user(token)
+    if user is None:
+        return None
+    return '"user-%d-%s-%s"' % (user.pk, get_calendar_version(), get_user_schedule_version(user.pk))
+
+
+def _session_feed_uid(request, session):
+    """
+    Occurrences of a recurrence keep their uid when they are materialized as a session.
+    """
+    if session.recurrence_id:
+        return 'occurrence-%s@%s' % (session.get_occurrence_key(), request.get_host())
+    return 'session-%d@%s' % (session.id, request.get_host())
+
+
+def _session_feed_events(request, sessions):
+    for session in sessions.with_resolved_details().defer('extra_info', 'course__description').iterator():
+        yield format_event(_session_feed_uid(request, session), session.start, session.get_end(),
+                           session.course.course_name, location=session.get_location(),
+                           url=request.build_absolute_uri(session.get_calendar_url()))
+
+
+def _occurrence_feed_events(request, recurrences, since):
+    for recurrence in recurrences.filter(until__gte=since).select_related('course'):
+        for session in recurrence.build_sessions(since, recurrence.until + timedelta(seconds=1)):
+            yield format_event(_session_feed_uid(request, session), session.start, session.get_end(),
+                               recurrence.course.course_name, location=session.get_location(),
+                               url=request.build_absolute_uri(session.get_calendar_url()))
+
+
+def _public_feed_events(request, since):
+    for event in Event.objects.filter(start__gte=since).defer('description').iterator():
+        yield format_event('event-%d@%s' % (event.id, request.get_host()), event.start, event.get_end(),
+                           event.event_name, url=request.build_absolute_uri(event.get_absolute_url()))
+    for building_day in BuildingDay.objects.filter(start__gte=since).defer('description').iterator():
+        yield format_event('building-day-%d@%s' % (building_day.id, request.get_host()), building_day.start,
+                           building_day.get_end(), 'Bouwdag',
+                           url=request.build_absolute_uri(building_day.get_absolute_url()))
+    for event in _session_feed_events(request, Session.objects.filter(start__gte=since, course__is_active=True)):
+        yield event
+    for event in _occurrence_feed_events(request, SessionRecurrence.objects.filter(course__is_active=True), since):
+        yield event
+
+
+@condition(etag_func=_public_feed_etag)
+def get_public_ical_feed(request):
+    """
+    The sessions of the active courses, events and building days as an iCalendar subscription feed.
+    """
+    since = timezone.now() - timedelta(days=ICAL_FEED_HISTORY_DAYS)
+    return StreamingHttpResponse(iter_calendar('Open Gym', _public_feed_events(request, since)),
+                                 content_type='text/calendar; charset=utf-8')
+
+
+@condition(etag_func=_user_feed_etag)
+def get_user_ical_feed(request, token):
+    """
+    The sessions a user is subscribed to and the sessions of the courses the user teaches, authenticated by the
+    token in the url so calendar apps can poll it.
+    """
+    user = calendar_feed_token.get_user(token)
+    if user is None:
+        raise Http404
+    since = timezone.now() - timedelta(days=ICAL_FEED_HISTORY_DAYS)
+    sessions = Session.objects.filter(Q(subscribed_users=user) | Q(course__teachers=user), start__gte=since) \
+        .distinct()
+    occurrences = _occurrence_feed_events(request, SessionRecurrence.objects.filter(course__teachers=user), since)
+    return StreamingHttpResponse(iter_calendar('Open Gym - %s' % user.first_name,
+                                               chain(_session_feed_events(request, sessions), occurrences)),
+                                 content_type='text/calendar; charset=utf-8')
+
+
 class ImpossibleView(generic.TemplateView):
     """View where the user ends when he does something wrong"""
     template_name = "coursemanaging/impossible.html"
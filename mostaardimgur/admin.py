@@ -1,12 +1,18 @@
 from django.contrib import admin
 
 # Register your models here.
-from mostaardimgur.models import ImgurAlbum, ImgurSetting
+from mostaardimgur.models import ImgurAlbum, ImgurSetting, ImgurUploadJob
 
 
 class ImgurSettingAdmin(admin.ModelAdmin):
     list_display = ('setting', 'value')
 
 
+class ImgurUploadJobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'album', 'status', 'attempts', 'run_after')
+    list_filter = ('status',)
+
+
 admin.site.register(ImgurAlbum)
 admin.site.register(ImgurSetting, ImgurSettingAdmin)
+admin.site.register(ImgurUploadJob, ImgurUploadJobAdmin)
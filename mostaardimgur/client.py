@@ -0,0 +1,105 @@
+import os
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+from imgurpython import ImgurClient
+from imgurpython.client import API_URL, MASHAPE_URL
+from imgurpython.helpers.error import ImgurClientError, ImgurClientRateLimitError
+
+
+class MultipartBody(object):
+    """
+    A multipart/form-data request body with a single file, streamed from the file in chunks of chunk_size bytes,
+    so an upload never holds more than one chunk in memory. The length is known up front, requests sends it as
+    Content-Length instead of a chunked body. Can be iterated again when a request is repeated.
+    """
+
+    def __init__(self, fields, file_field, file_name, file, content_type='application/octet-stream',
+                 chunk_size=64 * 1024):
+        self.boundary = uuid.uuid4().hex
+        self.file = file
+        self.chunk_size = chunk_size
+        parts = []
+        for name, value in fields.items():
+            parts.append('--%s\r\nContent-Disposition: form-data; name="%s"\r\n\r\n%s\r\n'
+                         % (self.boundary, name, value))
+        file_name = os.path.basename(file_name or 'image').replace('"', '')
+        parts.append('--%s\r\nContent-Disposition: form-data; name="%s"; filename="%s"\r\nContent-Type: %s\r\n\r\n'
+                     % (self.boundary, file_field, file_name, content_type))
+        self.head = ''.join(parts).encode('utf-8')
+        self.tail = ('\r\n--%s--\r\n' % self.boundary).encode('utf-8')
+        self.file.seek(0, os.SEEK_END)
+        self.file_size = self.file.tell()
+
+    @property
+    def content_type(self):
+        return 'multipart/form-data; boundary=%s' % self.boundary
+
+    def __len__(self):
+        return len(self.head) + self.file_size + len(self.tail)
+
+    def __iter__(self):
+        yield self.head
+        self.file.seek(0)
+        while True:
+            chunk = self.file.read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        yield self.tail
+
+
+class PooledImgurClient(ImgurClient):
+    """
+    An ImgurClient that sends its requests through one requests session, so the connection to the API is kept open
+    and reused instead of a new TLS handshake for every call. Mirrors ImgurClient.make_request otherwise.
+    """
+
+    def __init__(self, client_id, client_secret, access_token=None, refresh_token=None, mashape_key=None,
+                 base_url=API_URL, pool_size=10):
+        self.base_url = base_url
+        self.session = requests.Session()
+        # one connection for every thread that uploads at the same time
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        super(PooledImgurClient, self).__init__(client_id, client_secret, access_token=access_token,
+                                                refresh_token=refresh_token, mashape_key=mashape_key)
+
+    def get_url(self, route):
+        return (MASHAPE_URL if self.mashape_key is not None else self.base_url) + \
+               ('3/%s' % route if 'oauth2' not in route else route)
+
+    def send(self, method, url, headers, data):
+        if isinstance(data, MultipartBody):
+            headers['Content-Type'] = data.content_type
+        if method in ('delete', 'get'):
+            return self.session.request(method, url, headers=headers, params=data, data=data)
+        return self.session.request(method, url, headers=headers, data=data)
+
+    def make_request(self, method, route, data=None, force_anon=False):
+        method = method.lower()
+        url = self.get_url(route)
+        response = self.send(method, url, self.prepare_headers(force_anon), data)
+        if response.status_code == 403 and self.auth is not None:
+            self.auth.refresh()
+            response = self.send(method, url, self.prepare_headers(), data)
+        self.credits = {
+            'UserLimit': response.headers.get('X-RateLimit-UserLimit'),
+            'UserRemaining': response.headers.get('X-RateLimit-UserRemaining'),
+            'UserReset': response.headers.get('X-RateLimit-UserReset'),
+            'ClientLimit': response.headers.get('X-RateLimit-ClientLimit'),
+            'ClientRemaining': response.headers.get('X-RateLimit-ClientRemaining'),
+            # uploads are limited per IP address as well, the reset is in seconds from now
+            'PostRemaining': response.headers.get('X-Post-Rate-Limit-Remaining'),
+            'PostReset': response.headers.get('X-Post-Rate-Limit-Reset')
+        }
+        if response.status_code == 429:
+            raise ImgurClientRateLimitError()
+        try:
+            response_data = response.json()
+        except ValueError:
+            raise ImgurClientError('JSON decoding of response failed.')
+        if 'data' in response_data and isinstance(response_data['data'], dict) and 'error' in response_data['data']:
+            raise ImgurClientError(response_data['data']['error'], response.status_code)
+        return response_data['data'] if 'data' in response_data else response_data
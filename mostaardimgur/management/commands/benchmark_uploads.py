@@ -0,0 +1,85 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+
+from mostaardimgur.client import PooledImgurClient
+from mostaardimgur.models import ImgurAlbum, ImgurImage
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Answers like the Imgur API after the latency of the server, every fifth upload fails when failures are on.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.respond(200, {'data': {}, 'success': True})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.server.latency)
+        with self.server.lock:
+            self.server.uploads += 1
+            number = self.server.uploads
+        if self.server.failures and number % 5 == 0:
+            self.respond(500, {'data': {'error': 'stand-in failure'}, 'success': False})
+        else:
+            link = 'http://i.imgur.test/%07d.jpg' % number
+            self.respond(200, {'data': {'id': '%07d' % number, 'link': link}, 'success': True})
+
+    def respond(self, status, body):
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Uploads generated images to a local stand-in for the Imgur API, one at a time and with the thread ' \
+           'pool of the album upload, and reports the time of both. Nothing is written to the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', type=int, default=40, help='number of images in the album')
+        parser.add_argument('--size', type=int, default=500, help='size of an image in kB')
+        parser.add_argument('--latency', type=float, default=0.5, help='seconds the stand-in takes per upload')
+        parser.add_argument('--workers', type=int, action='append', help='pool sizes to compare, default 1 and 4')
+        parser.add_argument('--failures', action='store_true', help='let every fifth upload fail')
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        server.latency, server.failures, server.uploads, server.lock = \
+            options['latency'], options['failures'], 0, threading.Lock()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            album = ImgurAlbum(imgur_id='benchmark', title='benchmark')
+            content = os.urandom(options['size'] * 1024)
+            for workers in options['workers'] or [1, 4]:
+                client = PooledImgurClient('benchmark', 'benchmark', pool_size=workers,
+                                           base_url='http://127.0.0.1:%d/' % server.server_port)
+                images = [SimpleUploadedFile('image-%d.jpg' % i, content, 'image/jpeg')
+                          for i in range(options['images'])]
+                started = time.time()
+                results = ImgurImage.objects.upload_imgur_images([(image, album) for image in images], client, workers)
+                elapsed = time.time() - started
+                uploaded = [result for result in results if isinstance(result, ImgurImage)]
+                errors = [result for result in results if not isinstance(result, ImgurImage)]
+                self.stdout.write('%2d workers: %d uploaded, %d failed in %.2f s, %.1f images/s'
+                                  % (workers, len(uploaded), len(errors), elapsed, len(images) / elapsed))
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mostaardimgur.uploads import process_upload_jobs
+
+
+class Command(BaseCommand):
+    help = 'Uploads the staged album images to Imgur. Run it from cron, or keep it running with --loop. Failed ' \
+           'uploads are retried with backoff and the worker pauses when the Imgur rate limit is nearly used up.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100, help='Maximum number of uploads per run')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new jobs')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds to wait when there are no jobs')
+
+    def handle(self, *args, **options):
+        while True:
+            processed, delay = process_upload_jobs(options['limit'])
+            if processed:
+                self.stdout.write('processed %d uploads' % processed)
+            if delay:
+                self.stdout.write('rate limited, waiting %d seconds' % delay)
+            if not options['loop']:
+                break
+            if delay:
+                time.sleep(delay)
+            elif processed < options['limit']:
+                time.sleep(options['interval'])
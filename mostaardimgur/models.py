@@ -1,8 +1,43 @@
-import base64
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from django.db import models
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.db import models, transaction
+from django.db.models import Count
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.urls import reverse_lazy
-from imgurpython import ImgurClient
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+from imgurpython.helpers.error import ImgurClientError, ImgurClientRateLimitError
+from requests import RequestException
+
+from mostaardimgur.client import MultipartBody, PooledImgurClient
+from mostaardimgur.preprocessing import prepared_upload
+
+SETTINGS_VERSION_KEY = 'imgur:settings:version'
+# the settings and the client built from them, shared by the threads of this process
+_settings_cache = {'version': None, 'values': {}, 'client': None}
+_settings_lock = threading.Lock()
+
+
+def get_settings_version():
+    """
+    Shared between the processes through the cache, initialised with a timestamp like the calendar version.
+    """
+    cache.add(SETTINGS_VERSION_KEY, int(time.time() * 1000), None)
+    return cache.get(SETTINGS_VERSION_KEY)
+
+
+def bump_settings_version():
+    try:
+        cache.incr(SETTINGS_VERSION_KEY)
+    except ValueError:
+        get_settings_version()
 
 
 class ImgurSetting(models.Model):
@@ -20,18 +55,33 @@ class ImgurSetting(models.Model):
     setting = models.SmallIntegerField(choices=SETTINGS, unique=True)
     value = models.CharField(max_length=50)
 
+    @classmethod
+    def get_settings(cls):
+        """
+        All values by setting, loaded with a single query and kept in the process until a setting is saved.
+        """
+        version = get_settings_version()
+        with _settings_lock:
+            if _settings_cache['version'] != version:
+                _settings_cache.update(version=version, values=dict(cls.objects.values_list('setting', 'value')),
+                                       client=None)
+            return _settings_cache['values']
+
     @classmethod
     def get_settings_value(cls, setting):
-        if cls.objects.filter(setting=setting).exists():
-            return cls.objects.get(setting=setting).value
-        return None
+        return cls.get_settings().get(setting)
 
     @classmethod
     def set_settings_value(cls, setting, value):
-        if cls.objects.filter(setting=setting).exists():
-            cls.objects.get(setting=setting).value = value
-        else:
-            cls.objects.create(setting=setting, value=value)
+        cls.objects.update_or_create(setting=setting, defaults={'value': value})
+
+
+@receiver(post_save, sender=ImgurSetting)
+@receiver(post_delete, sender=ImgurSetting)
+def invalidate_settings(sender, **kwargs):
+    # again after the commit, in case another process cached the old values under the first new version
+    bump_settings_version()
+    transaction.on_commit(bump_settings_version)
 
 
 class ImgurAlbumManager(models.Manager):
@@ -65,18 +115,27 @@ class ImgurAlbum(models.Model):
 
     def __init__(self, *args, **kwargs):
         super(ImgurAlbum, self).__init__(*args, **kwargs)
-        self.__original_cover_image = self.cover_image
+        self.__original_cover_image_id = self.cover_image_id
 
     def get_absolute_url(self):
         return reverse_lazy('mostaardimgur:album-detail', args=[self.id])
 
+    def get_upload_progress(self):
+        """
+        The number of upload jobs of the album by status, counted in one query.
+        """
+        progress = {ImgurUploadJob.PENDING: 0, ImgurUploadJob.DONE: 0, ImgurUploadJob.FAILED: 0}
+        progress.update(self.upload_jobs.order_by().values_list('status').annotate(count=Count('id')))
+        progress['total'] = sum(progress.values())
+        return progress
+
     def delete(self, using=None, keep_parents=False):
         get_imgur_client().make_request('DELETE', 'album/%s' % self.imgur_id)
         return super(ImgurAlbum, self).delete(using, keep_parents)
 
     def save(self, force_insert=False, force_update=False, using=None,
              update_fields=None):
-        if self.cover_image != self.__original_cover_image:
+        if self.cover_image_id != self.__original_cover_image_id:
             data = {
                 'cover': self.cover_image.imgur_id,
             }
@@ -87,18 +146,40 @@ class ImgurAlbum(models.Model):
 
 class ImgurImageManager(models.Manager):
 
-    def create_imgur_image(self, image, album):
-        base64_image = base64.b64encode(image.file.read())
-        data = {
-            'image': base64_image,
-            'type': 'base64',
-            'album': album.imgur_id
-        }
-        image = get_imgur_client().make_request('POST', 'upload', data)
+    def upload_imgur_image(self, image, album, client=None):
+        """
+        Uploads the image to the album on Imgur and returns the unsaved ImgurImage, without using the database.
+        """
+        with prepared_upload(image) as (upload_file, content_type):
+            data = MultipartBody({'type': 'file', 'album': album.imgur_id}, 'image', image.name, upload_file,
+                                 content_type=content_type,
+                                 chunk_size=getattr(settings, 'IMGUR_UPLOAD_CHUNK_SIZE', 64 * 1024))
+            image = (client or get_imgur_client()).make_request('POST', 'upload', data)
         url = image['link'].rsplit('.', 1)
         thumbs_url = url[0] + 'm.' + url[1]
-        return ImgurImage.objects.create(imgur_id=image['id'], thumbs_url=thumbs_url, image_url=image['link'],
-                                         imgur_album=album)
+        return ImgurImage(imgur_id=image['id'], thumbs_url=thumbs_url, image_url=image['link'], imgur_album=album)
+
+    def create_imgur_image(self, image, album):
+        imgur_image = self.upload_imgur_image(image, album)
+        imgur_image.save()
+        return imgur_image
+
+    def upload_imgur_images(self, uploads, client=None, workers=None):
+        """
+        Uploads the (image, album) pairs with at most IMGUR_UPLOAD_WORKERS at the same time, without using the
+        database. Returns, in the order of the pairs, the unsaved ImgurImage or the error that stopped the upload.
+        """
+        client = client or get_imgur_client()
+        workers = workers or getattr(settings, 'IMGUR_UPLOAD_WORKERS', 4)
+        results = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self.upload_imgur_image, image, album, client) for image, album in uploads]
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except (ImgurClientError, ImgurClientRateLimitError, RequestException, KeyError, OSError) as error:
+                    results.append(error)
+        return results
 
 
 class ImgurImage(models.Model):
@@ -114,7 +195,75 @@ class ImgurImage(models.Model):
         return super(ImgurImage, self).delete(using, keep_parents)
 
 
+@deconstructible
+class StagingStorage(FileSystemStorage):
+    """
+    Keeps the staged uploads out of MEDIA_ROOT, they are never served.
+    """
+
+    def __init__(self):
+        super(StagingStorage, self).__init__(location=getattr(
+            settings, 'IMGUR_UPLOAD_STAGING_ROOT', os.path.join(getattr(settings, 'BASE_DIR', os.getcwd()),
+                                                                'imgur-uploads')))
+
+
+class ImgurUploadJobManager(models.Manager):
+
+    def stage(self, images, album):
+        """
+        Stores the uploaded files on disk and queues a job per file, the upload_imgur_images command sends them.
+        """
+        jobs = []
+        for image in images:
+            job = ImgurUploadJob(album=album, name=image.name[:ImgurUploadJob._meta.get_field('name').max_length])
+            job.file.save(image.name, image, save=False)
+            jobs.append(job)
+        return self.bulk_create(jobs)
+
+
+class ImgurUploadJob(models.Model):
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = ((PENDING, 'Wachtend'), (DONE, 'Geüpload'), (FAILED, 'Mislukt'))
+
+    album = models.ForeignKey(ImgurAlbum, on_delete=models.CASCADE, related_name='upload_jobs')
+    name = models.CharField(max_length=255)
+    file = models.FileField(upload_to='%Y/%m/%d', storage=StagingStorage(), blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    image = models.OneToOneField(ImgurImage, on_delete=models.SET_NULL, null=True, blank=True)
+    created = models.DateTimeField(default=timezone.now)
+    run_after = models.DateTimeField(default=timezone.now, db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    objects = ImgurUploadJobManager()
+
+    class Meta:
+        ordering = ['created', 'id']
+
+    def __str__(self):
+        return self.name + ' ' + self.get_status_display()
+
+
+@receiver(post_delete, sender=ImgurUploadJob)
+def remove_staged_file(sender, instance, **kwargs):
+    if instance.file:
+        instance.file.delete(save=False)
+
+
 def get_imgur_client():
-    return ImgurClient(client_id=ImgurSetting.get_settings_value(ImgurSetting.CLIENT_ID),
-                       client_secret=ImgurSetting.get_settings_value(ImgurSetting.CLIENT_SECRET),
-                       refresh_token=ImgurSetting.get_settings_value(ImgurSetting.REFRESH_TOKEN))
+    """
+    The client of this process, built again when the settings changed.
+    """
+    values = ImgurSetting.get_settings()
+    with _settings_lock:
+        client = _settings_cache['client']
+        if client is None or _settings_cache['values'] is not values:
+            client = PooledImgurClient(client_id=values.get(ImgurSetting.CLIENT_ID),
+                                       client_secret=values.get(ImgurSetting.CLIENT_SECRET),
+                                       refresh_token=values.get(ImgurSetting.REFRESH_TOKEN),
+                                       pool_size=getattr(settings, 'IMGUR_UPLOAD_WORKERS', 4))
+            if _settings_cache['values'] is values:
+                _settings_cache['client'] = client
+        return client
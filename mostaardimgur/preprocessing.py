@@ -0,0 +1,126 @@
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image
+
+# the formats that are shrunk, with the format and content type they are saved in
+OUTPUT_FORMATS = {'JPEG': ('JPEG', 'image/jpeg'), 'MPO': ('JPEG', 'image/jpeg'), 'PNG': ('PNG', 'image/png'),
+                  'WEBP': ('WEBP', 'image/webp')}
+
+ORIENTATION_TAG = 0x0112
+# the transposition that turns an image with the EXIF orientation upright
+ORIENTATION_TRANSPOSE = {2: Image.FLIP_LEFT_RIGHT, 3: Image.ROTATE_180, 4: Image.FLIP_TOP_BOTTOM,
+                         5: Image.TRANSPOSE, 6: Image.ROTATE_270, 7: Image.TRANSVERSE, 8: Image.ROTATE_90}
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def is_enabled():
+    return bool(getattr(settings, 'IMGUR_UPLOAD_MAX_DIMENSION', None))
+
+
+def get_executor():
+    """
+    The process pool of this process, shared by all threads that upload.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=getattr(settings, 'IMGUR_PREPROCESS_WORKERS', None))
+        return _executor
+
+
+def reset_executor():
+    global _executor
+    with _executor_lock:
+        _executor = None
+
+
+def get_orientation(image):
+    """
+    The EXIF orientation of the image, read with _getexif since Pillow only has ImageOps.exif_transpose from 6.0.
+    """
+    try:
+        return (image._getexif() or {}).get(ORIENTATION_TAG)
+    except Exception:
+        # no EXIF support for the format, or EXIF data Pillow can not parse
+        return None
+
+
+def shrink_image(source, max_dimension, quality):
+    """
+    Runs in a worker process. Scales the image at the path or in the bytes of source down to fit max_dimension,
+    turns it upright and saves it without its EXIF data to a temporary file. Returns the path and content type of
+    that file, or None when the image is small enough and has no EXIF data.
+    """
+    image = Image.open(source if isinstance(source, str) else BytesIO(source))
+    if image.format not in OUTPUT_FORMATS or getattr(image, 'is_animated', False):
+        return None
+    if max(image.size) <= max_dimension and 'exif' not in image.info:
+        return None
+    output_format, content_type = OUTPUT_FORMATS[image.format]
+    orientation = get_orientation(image)
+    image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    if orientation in ORIENTATION_TRANSPOSE:
+        image = image.transpose(ORIENTATION_TRANSPOSE[orientation])
+    # some encoders copy the EXIF data of the info of the image
+    image.info.pop('exif', None)
+    if output_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    options = {'quality': quality, 'optimize': True} if output_format != 'PNG' else {'optimize': True}
+    with tempfile.NamedTemporaryFile(suffix='.' + output_format.lower(), delete=False) as output:
+        image.save(output, output_format, **options)
+    return output.name, content_type
+
+
+def _get_source(image):
+    """
+    A path to read the image from in the worker process, or the bytes of an image that lives in memory.
+    """
+    if hasattr(image, 'temporary_file_path'):
+        return image.temporary_file_path()
+    try:
+        return image.path
+    except (AttributeError, NotImplementedError):
+        image.seek(0)
+        return image.read()
+
+
+@contextmanager
+def prepared_upload(image):
+    """
+    Yields the (file, content type) to upload for an uploaded or staged image. With IMGUR_UPLOAD_MAX_DIMENSION set
+    that is a downscaled and recompressed copy made in the process pool, otherwise or when the image can not be
+    shrunk it is the image itself.
+    """
+    content_type = getattr(image, 'content_type', None) or 'application/octet-stream'
+    result = None
+    if is_enabled():
+        try:
+            result = get_executor().submit(shrink_image, _get_source(image), settings.IMGUR_UPLOAD_MAX_DIMENSION,
+                                           getattr(settings, 'IMGUR_UPLOAD_QUALITY', 85)).result()
+        except BrokenProcessPool:
+            logger.exception("The image process pool broke while shrinking %s, uploading the original", image)
+            reset_executor()
+        except Exception:
+            # whatever went wrong while shrinking, Imgur gets the original
+            logger.exception("Could not shrink %s, uploading the original", image)
+    if result is None:
+        yield image.file, content_type
+        return
+    path, content_type = result
+    try:
+        with open(path, 'rb') as shrunk_file:
+            yield shrunk_file, content_type
+    finally:
+        os.remove(path)
@@ -1,3 +1,77 @@
+import io
+import os
+import struct
+
+from django.core.cache import cache
 from django.test import TestCase
+from PIL import Image
+
+from mostaardimgur.client import MultipartBody
+from mostaardimgur.models import ImgurSetting
+from mostaardimgur.preprocessing import shrink_image
+from mostaardimgur.uploads import get_rate_limit_delay
+
+
+class ImgurSettingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_set_settings_value(self):
+        ImgurSetting.set_settings_value(ImgurSetting.CLIENT_ID, 'first')
+        ImgurSetting.set_settings_value(ImgurSetting.CLIENT_ID, 'second')
+        self.assertEqual(ImgurSetting.objects.get(setting=ImgurSetting.CLIENT_ID).value, 'second')
+        self.assertEqual(ImgurSetting.get_settings_value(ImgurSetting.CLIENT_ID), 'second')
+
+    def test_settings_cached(self):
+        ImgurSetting.set_settings_value(ImgurSetting.CLIENT_ID, 'client')
+        ImgurSetting.get_settings_value(ImgurSetting.CLIENT_ID)
+        with self.assertNumQueries(0):
+            self.assertEqual(ImgurSetting.get_settings_value(ImgurSetting.CLIENT_ID), 'client')
+            self.assertIsNone(ImgurSetting.get_settings_value(ImgurSetting.CLIENT_SECRET))
+
+
+class RateLimitTest(TestCase):
+    def test_no_delay_with_credits_left(self):
+        self.assertEqual(get_rate_limit_delay({'UserRemaining': '500', 'ClientRemaining': '10000',
+                                               'PostRemaining': '40'}), 0)
+        self.assertEqual(get_rate_limit_delay(None), 0)
+
+    def test_delay_until_reset(self):
+        self.assertEqual(get_rate_limit_delay({'UserRemaining': '2', 'UserReset': '1000'}, now=100), 900)
+        self.assertEqual(get_rate_limit_delay({'PostRemaining': '0', 'PostReset': '120'}), 120)
+
+
+class MultipartBodyTest(TestCase):
+    def test_streamed_in_chunks(self):
+        content = b'x' * 10000
+        body = MultipartBody({'type': 'file'}, 'image', 'photo.jpg', io.BytesIO(content), chunk_size=1024)
+        chunks = list(body)
+        self.assertEqual(len(b''.join(chunks)), len(body))
+        self.assertTrue(all(len(chunk) <= 1024 for chunk in chunks[1:-1]))
+        self.assertIn(content, b''.join(chunks))
+        self.assertEqual(b''.join(body), b''.join(chunks))
+
+
+class ShrinkImageTest(TestCase):
+    def photo(self, size):
+        # EXIF data with a single IFD entry: orientation (0x0112), SHORT, 1 value: 6, rotated 90 degrees
+        exif = b'Exif\x00\x00' + b'MM\x00\x2a\x00\x00\x00\x08' + struct.pack('>HHHIHHI', 1, 0x0112, 3, 1, 6, 0, 0)
+        content = io.BytesIO()
+        Image.new('RGB', size, 'red').save(content, 'JPEG', exif=exif)
+        return content.getvalue()
+
+    def test_downscaled_without_exif(self):
+        path, content_type = shrink_image(self.photo((3000, 2000)), 1000, 85)
+        try:
+            image = Image.open(path)
+            self.assertEqual(content_type, 'image/jpeg')
+            # turned upright by the orientation in the EXIF data
+            self.assertEqual(image.size, (667, 1000))
+            self.assertNotIn('exif', image.info)
+        finally:
+            os.remove(path)
 
-# Create your tests here.
+    def test_small_image_kept(self):
+        content = io.BytesIO()
+        Image.new('RGB', (300, 200), 'red').save(content, 'PNG')
+        self.assertIsNone(shrink_image(content.getvalue(), 1000, 85))
@@ -0,0 +1,124 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from imgurpython.helpers.error import ImgurClientRateLimitError
+
+from mostaardimgur.models import ImgurImage, ImgurUploadJob, get_imgur_client
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_rate_limit_delay(credits, now=None):
+    """
+    The seconds to wait before the next upload according to the rate limit headers of the last response, 0 while
+    more than IMGUR_RATE_LIMIT_RESERVE requests are left.
+    """
+    now = now or time.time()
+    reserve = getattr(settings, 'IMGUR_RATE_LIMIT_RESERVE', 10)
+    credits = credits or {}
+    delays = [0]
+    post_remaining = _to_int(credits.get('PostRemaining'))
+    if post_remaining is not None and post_remaining <= 0:
+        delays.append(_to_int(credits.get('PostReset')) or 60 * 60)
+    user_remaining = _to_int(credits.get('UserRemaining'))
+    if user_remaining is not None and user_remaining <= reserve:
+        delays.append(max((_to_int(credits.get('UserReset')) or now) - now, 60))
+    client_remaining = _to_int(credits.get('ClientRemaining'))
+    if client_remaining is not None and client_remaining <= reserve:
+        # the client limit is daily and its reset is not told
+        delays.append(getattr(settings, 'IMGUR_CLIENT_LIMIT_DELAY', 60 * 60))
+    return max(delays)
+
+
+def get_retry_delay(attempts):
+    delay = getattr(settings, 'IMGUR_UPLOAD_RETRY_DELAY', 30) * 2 ** (attempts - 1)
+    return min(delay, getattr(settings, 'IMGUR_UPLOAD_MAX_RETRY_DELAY', 60 * 60))
+
+
+def postpone_pending(seconds):
+    ImgurUploadJob.objects.filter(status=ImgurUploadJob.PENDING, run_after__lt=timezone.now() + timedelta(
+        seconds=seconds)).update(run_after=timezone.now() + timedelta(seconds=seconds))
+
+
+def claim_jobs(count):
+    """
+    Claims due jobs in a short transaction by moving their run_after past IMGUR_UPLOAD_CLAIM_TIMEOUT, so other
+    workers skip them while they are uploaded. The job of a worker that died is uploaded again after the timeout.
+    Rows locked by another worker are skipped where the database supports it, otherwise the lock is waited for.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = ImgurUploadJob.objects.filter(status=ImgurUploadJob.PENDING, run_after__lte=now)
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        else:
+            due = due.select_for_update()
+        jobs = list(due.select_related('album').order_by('run_after', 'id')[:count])
+        claim_timeout = timedelta(seconds=getattr(settings, 'IMGUR_UPLOAD_CLAIM_TIMEOUT', 10 * 60))
+        ImgurUploadJob.objects.filter(pk__in=[job.pk for job in jobs]).update(run_after=now + claim_timeout)
+    return jobs
+
+
+def record_result(job, result, client):
+    """
+    Stores the ImgurImage or the error of the upload of a job, a failed upload is tried again later until it
+    failed IMGUR_UPLOAD_MAX_ATTEMPTS times. Returns the seconds to wait because of the rate limit.
+    """
+    if isinstance(result, ImgurClientRateLimitError):
+        # not the fault of the file, it does not count as an attempt
+        delay = max(get_rate_limit_delay(client.credits), get_retry_delay(1))
+        ImgurUploadJob.objects.filter(pk=job.pk).update(run_after=timezone.now() + timedelta(seconds=delay))
+        return delay
+    if isinstance(result, Exception):
+        job.attempts += 1
+        job.last_error = str(result) or type(result).__name__
+        job.run_after = timezone.now() + timedelta(seconds=get_retry_delay(job.attempts))
+        if job.attempts >= getattr(settings, 'IMGUR_UPLOAD_MAX_ATTEMPTS', 5):
+            job.status = ImgurUploadJob.FAILED
+        job.save(update_fields=['attempts', 'last_error', 'status', 'run_after'])
+        return 0
+    with transaction.atomic():
+        result.save()
+        job.image = result
+        job.status = ImgurUploadJob.DONE
+        job.save(update_fields=['image', 'status'])
+    job.file.delete(save=False)
+    job.save(update_fields=['file'])
+    return 0
+
+
+def process_upload_jobs(limit=100):
+    """
+    Uploads due jobs in batches of IMGUR_UPLOAD_WORKERS files at the same time. The jobs are claimed before and
+    their results stored after the uploads, no transaction stays open while talking to Imgur. Returns the number
+    of processed jobs and the seconds to wait before uploading more, the due jobs are postponed by that delay so
+    the other workers wait as well.
+    """
+    client = get_imgur_client()
+    workers = getattr(settings, 'IMGUR_UPLOAD_WORKERS', 4)
+    processed = 0
+    while processed < limit:
+        jobs = claim_jobs(min(workers, limit - processed))
+        if not jobs:
+            break
+        try:
+            results = ImgurImage.objects.upload_imgur_images([(job.file, job.album) for job in jobs], client,
+                                                             workers)
+        finally:
+            for job in jobs:
+                job.file.close()
+        delay = max(record_result(job, result, client) for job, result in zip(jobs, results))
+        processed += len(jobs)
+        delay = max(delay, get_rate_limit_delay(client.credits))
+        if delay:
+            postpone_pending(delay)
+            return processed, delay
+    return processed, 0
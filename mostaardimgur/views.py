@@ -3,14 +3,14 @@ from django.shortcuts import redirect, get_object_or_404
 from django.views import generic
 
 from mostaardimgur.forms import AlbumForm
-from mostaardimgur.models import ImgurAlbum, ImgurSetting, ImgurImage, get_imgur_client
+from mostaardimgur.models import ImgurAlbum, ImgurSetting, ImgurImage, ImgurUploadJob, get_imgur_client
 
 
 def catchtoken(request):
     if request.user.is_staff:
         ImgurSetting.set_settings_value(ImgurSetting.REFRESH_TOKEN, request.GET['refresh_token'])
         ImgurSetting.set_settings_value(ImgurSetting.USERNAME, request.GET['account_username'])
-        ImgurSetting.set_settings_value(ImgurSetting.USERNAME, request.GET['account_id'])
+        ImgurSetting.set_settings_value(ImgurSetting.ACCOUNT_ID, request.GET['account_id'])
         return HttpResponse('ok', status=200, content_type='text/plain')
 
 
@@ -23,6 +23,13 @@ class AlbumDetailView(generic.DetailView):
     context_object_name = 'album'
     template_name = "mostaardimgur/album.html"
 
+    def get_context_data(self, **kwargs):
+        context = super(AlbumDetailView, self).get_context_data(**kwargs)
+        if self.request.user.is_staff:
+            context['upload_progress'] = self.object.get_upload_progress()
+            context['failed_uploads'] = self.object.upload_jobs.filter(status=ImgurUploadJob.FAILED)
+        return context
+
     def post(self, request, *args, **kwargs):
         album = self.get_object()
         if self.request.user.is_staff:
@@ -70,9 +77,8 @@ class AlbumListView(generic.ListView):
                 images = request.FILES.getlist('images')
                 album = ImgurAlbum.objects.create_imgur_album(title=images_form.cleaned_data['album_name'],
                                                               description=images_form.cleaned_data['album_description'])
-                for image in images:
-                    ImgurImage.objects.create_imgur_image(image, album)
-                return redirect('mostaardimgur:album-list')
+                ImgurUploadJob.objects.stage(images, album)
+                return redirect(album.get_absolute_url())
 
 
 class AuthorizeRedirectView(generic.RedirectView):
@@ -5,8 +5,23 @@
         $('[data-toggle="tooltip"]').tooltip()
     })
 
+    // pre-rendered pages carry a marker instead of a csrf token, fetch a token for this visitor
+    $(function () {
+        var marker = "%%csrf_token%%";
+        var inputs = $('input[name="csrfmiddlewaretoken"]').filter(function () {
+            return $(this).val() === marker;
+        });
+        if (window.CSRF_TOKEN !== marker && !inputs.length) {
+            return;
+        }
+        $.getJSON("/csrf-token/", function (data) {
+            window.CSRF_TOKEN = data.token;
+            inputs.val(data.token);
+        });
+    });
+
     $(document).on("click", "button.remove-session", function () {
-        $('#remove-session').val($(this).attr("id"));
+        $('#remove-session').val($(this).attr("id")).attr("name", $(this).data("name"));
         $('#remove-help').html($("#time-" + $(this).attr("id")).html());
     });
 
@@ -26,10 +41,75 @@
         $('.custom-modal').hide();
     });
 
+    $(document).on("click", "button.load-past-sessions", function () {
+        var button = $(this);
+        var data = {};
+        if (button.data("before")) {
+            data = {'before': button.data("before"), 'before_id': button.data("before-id")};
+        }
+        $.ajax({
+            type: 'GET',
+            url: button.data("url"),
+            data: data,
+            success: function (html) {
+                button.closest("tr.past-sessions-more").replaceWith(html);
+            },
+            error: function (xhr, status, error) {
+                alert(error);
+            }
+        });
+    });
+
+
+    $(document).on("submit", "form.subscription-form", function (event) {
+        event.preventDefault();
+        var form = $(this);
+        $.ajax({
+            type: 'POST',
+            url: form.data("url"),
+            data: form.serialize(),
+            success: function (result) {
+                updateSubscriptionForm(form, result);
+            },
+            error: function (xhr, status, error) {
+                alert(xhr.responseJSON && xhr.responseJSON.error ? xhr.responseJSON.error : error);
+            }
+        });
+    });
 
 })(jQuery); // End of use strict
 
 
+function updateSubscriptionForm(form, result) {
+    var input = form.find("input[type=hidden]").not("[name=csrfmiddlewaretoken]");
+    var button = form.find("button[type=submit]");
+    if (result.course) {
+        $('#course-student-count').text(result.course.student_count);
+        if (result.state === 'subscribed') {
+            input.attr("name", "leave_course");
+            button.text("Uitschrijven");
+        } else if (result.course.places_left === 0) {
+            form.replaceWith('<button class="btn btn-primary disabled">Volzet</button>');
+        } else {
+            input.attr("name", "join_course");
+            button.text("Schrijf je in");
+        }
+        return;
+    }
+    input.val(result.session.id);
+    if (result.state === 'subscribed') {
+        input.attr("name", "leave_session");
+        button.text("Uitschrijven");
+    } else if (result.state === 'waitlisted') {
+        input.attr("name", "leave_waitlist");
+        button.text("Van wachtlijst halen");
+    } else {
+        input.attr("name", "join_session");
+        button.text(result.session.places_left === 0 ? "Volzet, zet me op de wachtlijst" : "Schrijf je in");
+    }
+}
+
+
 function checkMultipleSessions() {
     if ($('#id_multiple_sessions').is(":checked")) {
         $('#div_id_weekly_until').slideDown();